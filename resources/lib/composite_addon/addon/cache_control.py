@@ -155,6 +155,54 @@ class CacheControl:
 
         return False, None
 
+    def delete(self, cache_name):
+        if self.cache_location is None:
+            return False
+
+        if xbmcvfs.exists(self.cache_location + cache_name):
+            LOG.debug('CACHE [%s]: delete' % cache_name)
+            return xbmcvfs.delete(self.cache_location + cache_name)
+
+        return False
+
+    def list_cache(self, suffix=''):
+        """
+        :param suffix: only list the cache files ending with suffix
+        :return: list of cache names
+        """
+        if self.cache_location is None:
+            return []
+
+        _, file_list = xbmcvfs.listdir(self.cache_location)
+        return [cache_file for cache_file in file_list if cache_file.endswith(suffix)]
+
+    def delete_expired(self, max_age):
+        """
+        Delete the cache files that weren't written for max_age, persistent files are kept
+
+        :param max_age: seconds since the last write
+        :return: number of deleted files
+        """
+        if self.cache_location is None:
+            return 0
+
+        now = time.time()
+        deleted = 0
+
+        _, file_list = xbmcvfs.listdir(self.cache_location)
+        for cache_file in file_list:
+            if cache_file.endswith('.pcache'):
+                continue
+
+            filename = self.cache_location + cache_file
+            modified = xbmcvfs.Stat(filename).st_mtime()
+            if now - modified > max_age and xbmcvfs.delete(filename):
+                deleted += 1
+
+        LOG.debug('CACHE: deleted %s expired files from %s in |%.3fs|' %
+                  (deleted, self.cache_location, time.time() - now))
+        return deleted
+
     def delete_cache(self, force=False):
         if not CONFIG['cache_path'].startswith(self.ADDON_DATA_FOLDER):
             LOG.debug('CACHE: Cache not deleted, the cache path is'
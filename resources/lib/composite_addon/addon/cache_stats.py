@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2020 Composite (plugin.video.composite_for_plex)
+
+    This file is part of Composite (plugin.video.composite_for_plex)
+
+    SPDX-License-Identifier: GPL-2.0-or-later
+    See LICENSES/GPL-2.0-or-later.txt for more information.
+"""
+
+import threading
+
+from six import iteritems
+
+from .json_store import JSONStore
+
+# seconds between flushes of the counted cache statistics by the service
+FLUSH_INTERVAL = 300
+
+
+class CacheStatsStore(JSONStore):
+    _counters = {
+        'revalidated': 0,  # stale entries reused after a conditional request
+        'modified': 0,  # stale entries replaced after a conditional request
+        'bytes_saved': 0,
+        'seconds_saved': 0.0,
+    }
+
+    def __init__(self):
+        JSONStore.__init__(self, 'cache_stats.json')
+
+    def set_defaults(self):
+        data = self.get_data()
+        if not data:
+            data = {}
+
+        for counter, default in iteritems(self._counters):
+            if counter not in data:
+                data[counter] = default
+
+        self.save(data)
+
+    def increment(self, **counters):
+        data = self.get_data()
+        for counter, value in iteritems(counters):
+            data[counter] = data.get(counter, 0) + value
+        self.save(data)
+
+    def get_stats(self):
+        return self.get_data()
+
+
+_LOCK = threading.Lock()
+_PENDING = {}
+
+
+def record(**counters):
+    """
+    Count cache statistics in memory, they are saved by flush()
+    """
+    with _LOCK:
+        for counter, value in iteritems(counters):
+            _PENDING[counter] = _PENDING.get(counter, 0) + value
+
+
+def flush():
+    """
+    Add the counted cache statistics to the store, called by the service and at the end
+    of a plugin invocation
+    """
+    with _LOCK:
+        pending = dict(_PENDING)
+        _PENDING.clear()
+
+    if pending:
+        CacheStatsStore().increment(**pending)
@@ -12,6 +12,7 @@
 
 import socket
 import sys
+import time
 
 from six.moves import xrange
 from six.moves.urllib_parse import unquote
@@ -25,6 +26,12 @@ from .logger import Logger
 
 LOG = Logger()
 
+# resolved host names, keyed by host name, values are tuples (address, expires)
+# failed look ups are cached as well, for a shorter time
+DNS_CACHE = {}
+DNS_CACHE_TTL = 300
+DNS_CACHE_FAILURE_TTL = 30
+
 
 def get_argv():
     return sys.argv
@@ -121,6 +128,30 @@ def is_ip(address):
         return False
 
 
+def resolve_hostname(hostname):
+    """
+    Resolve a host name, results are cached for DNS_CACHE_TTL seconds
+
+    :param hostname: host name to resolve
+    :return: ip address or None if the host name could not be resolved
+    """
+    now = time.time()
+
+    cached = DNS_CACHE.get(hostname)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    try:
+        address = socket.gethostbyname(hostname)
+        expires = now + DNS_CACHE_TTL
+    except:  # pylint: disable=bare-except
+        address = None
+        expires = now + DNS_CACHE_FAILURE_TTL
+
+    DNS_CACHE[hostname] = (address, expires)
+    return address
+
+
 def get_platform_ip():
     return xbmc.getIPAddress()
 
@@ -130,6 +130,29 @@ COMBINED_SECTIONS = [
     str(MODES.TRACKS_SEARCH_ALL),
 ]
 
+WIDGET_MODES = [
+    # Widget listings the service keeps ready to render
+    MODES.WIDGETS,
+    MODES.TVSHOWS_ON_DECK,
+    MODES.MOVIES_ON_DECK,
+    MODES.EPISODES_RECENTLY_ADDED,
+    MODES.MOVIES_RECENTLY_ADDED,
+    MODES.TXT_MOVIES_ON_DECK,
+    MODES.TXT_MOVIES_RECENT_ADDED,
+    MODES.TXT_MOVIES_RECENT_RELEASE,
+    MODES.TXT_TVSHOWS_ON_DECK,
+    MODES.TXT_TVSHOWS_RECENT_ADDED,
+    MODES.TXT_TVSHOWS_RECENT_AIRED,
+]
+
+WATCH_STATE_ATTRIBUTES = [
+    # Item attributes that change with the watch state
+    'viewCount',
+    'viewOffset',
+    'viewedLeafCount',
+    'lastViewedAt',
+]
+
 CONFIG = {
     'addon': __ADDON,
     'id': __ID,
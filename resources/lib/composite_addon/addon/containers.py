@@ -21,6 +21,7 @@ class Context:
         self._params = None
         self._settings = None
         self._plex_network = None
+        self._payloads = False
 
     @property
     def params(self):
@@ -61,6 +62,18 @@ class Context:
         """
         self._plex_network = value
 
+    @property
+    def payloads(self):
+        return self._payloads
+
+    @payloads.setter
+    def payloads(self, value):
+        """
+        :param value: bool, create serializable item payloads instead of list items
+                      see addon/items/gui.create_gui_item
+        """
+        self._payloads = bool(value)
+
 
 class GUIItem:
     """
@@ -77,12 +90,15 @@ class GUIItem:
 
     @property
     def context_menu(self):
+        if callable(self._context_menu):
+            # deferred context menu, build it on first access
+            self._context_menu = self._context_menu()
         return self._context_menu
 
     @context_menu.setter
     def context_menu(self, value):
         """
-        :param value:
+        :param value: list of context menu items, or a callable returning the list
         """
         self._context_menu = value
 
@@ -12,9 +12,12 @@
 
 import os
 import random
+import threading
+import time
 from itertools import chain
 from itertools import groupby
 
+from six.moves import queue
 from six.moves import zip_longest
 
 import pyxbmct.addonwindow as pyxbmct  # pylint: disable=import-error
@@ -31,6 +34,13 @@ from .progress_dialog import ProgressDialog
 
 ACTION_STOP = 13
 
+# items added to the playlist between checks for cancellation
+ADD_CHUNK_SIZE = 25
+# seconds between progress updates while adding items to the playlist
+PROGRESS_INTERVAL = 0.25
+# section trees requested concurrently
+FETCH_CONCURRENCY = 4
+
 ACTIVE_DIALOG_PROPERTY = '-'.join([CONFIG['id'], 'dialog_active'])
 
 LOG = Logger('composite_playlist')
@@ -372,19 +382,8 @@ class PlaylistGenerator:
             playlist = xbmc.PlayList(xbmc.PLAYLIST_VIDEO)
             playlist.clear()
 
-            _divisor, _percent_value = self._get_progress_data(items, 29)
-            _percent = progress_dialog.percent
-
-            for index, item in enumerate(items):
-                if progress_dialog.is_canceled():
-                    return None
-
-                if index % _divisor == 0:
-                    _percent += _percent_value
-                progress_dialog.update(_percent,
-                                       i18n('Adding %s to playlist...') % item[1].getLabel())
-
-                playlist.add(*item)
+            if not self._add_to_playlist(playlist, items, progress_dialog):
+                return None
 
             if progress_dialog.is_canceled():
                 return None
@@ -393,6 +392,36 @@ class PlaylistGenerator:
             xbmc.sleep(500)
             return items[0]
 
+    @staticmethod
+    def _add_to_playlist(playlist, items, dialog):
+        """
+        Add the items in chunks, the progress is updated at most every PROGRESS_INTERVAL
+
+        :return: False if canceled
+        """
+        start_time = time.time()
+        last_update = start_time
+        updates = 0
+
+        add = playlist.add
+        for start in range(0, len(items), ADD_CHUNK_SIZE):
+            if dialog.is_canceled():
+                return False
+
+            chunk = items[start:start + ADD_CHUNK_SIZE]
+            for item in chunk:
+                add(*item)
+
+            if time.time() - last_update >= PROGRESS_INTERVAL:
+                last_update = time.time()
+                updates += 1
+                dialog.update(70 + int(29 * (start + len(chunk)) / len(items)),
+                              i18n('Adding %s to playlist...') % chunk[-1][1].getLabel())
+
+        LOG.debug('Added %s items to the playlist in %.2fs with %s progress updates' %
+                  (len(items), time.time() - start_time, updates))
+        return True
+
     def _get_progress_data(self, items, percent):
         item_count = len(items)
         _divisor = self._limiter(int(item_count // percent), lower_limit=1)
@@ -429,6 +458,10 @@ class PlaylistGenerator:
         return server_sections
 
     def _get_item_collection(self, server, tree):
+        """
+        :return: list of tuples (server, tree, video), the list items are only created
+                 for the sampled videos
+        """
         branches = tree.getiterator('Video')
         if branches is None:
             return []
@@ -436,15 +469,14 @@ class PlaylistGenerator:
         if tree.get('viewGroup') == 'show':
             branches = self._get_distributed_tvshows(branches)
 
-        item_collection = []
-        for content in branches:
-            item = Item(server, server.get_url_location(), tree, content, up_next=False)
-            if content.get('type') == 'episode':
-                item_collection.append((server, create_episode_item(self.context, item)))
-            elif content.get('type') == 'movie':
-                item_collection.append((server, create_movie_item(self.context, item)))
+        return [(server, tree, content) for content in branches
+                if content.get('type') in ('episode', 'movie')]
 
-        return item_collection
+    def _create_item(self, server, tree, content):
+        item = Item(server, server.get_url_location(), tree, content, up_next=False)
+        if content.get('type') == 'episode':
+            return create_episode_item(self.context, item)
+        return create_movie_item(self.context, item)
 
     def _get_item_collections(self, sections, dialog):
         _trees = self._get_section_trees(sections, dialog)
@@ -497,46 +529,82 @@ class PlaylistGenerator:
 
         return item_collections
 
+    def _get_section_tree(self, server, section):
+        key = int(section.get_key())
+
+        if self.source == 'all':
+            if section.content_type() == 'tvshows':
+                return server.get_section_all(key, item_type=4)
+            return server.get_section_all(key)
+        if self.source == 'on_deck':
+            return server.get_ondeck(section=key)
+        if self.source == 'recent_added':
+            return server.get_recently_added(section=key)
+        if self.source == 'recent_released':
+            return server.get_newest(section=key)
+
+        return None
+
     def _get_section_trees(self, sections, dialog):
-        trees = []
+        """
+        Fetch the section trees with up to FETCH_CONCURRENCY requests in flight,
+        progress is reported as they arrive and the trees keep the order of the sections
+
+        :return: list of tuples (server, tree), None if canceled
+        """
+        if not sections:
+            return []
+
+        tasks = queue.Queue()
+        for index, (server, section) in enumerate(sections):
+            tasks.put((index, server, section))
+
+        completed = queue.Queue()
+        cancelled = threading.Event()
+
+        def _fetch():
+            while not cancelled.is_set():
+                try:
+                    index, server, section = tasks.get_nowait()
+                except queue.Empty:
+                    return
+
+                try:
+                    tree = self._get_section_tree(server, section)
+                except Exception as error:  # pylint: disable=broad-except
+                    LOG.debug('Unable to retrieve %s from %s [%s]' %
+                              (section.get_title(), server.get_name(), error))
+                    tree = None
+
+                completed.put((index, server, section, tree))
+
+        for _ in range(min(FETCH_CONCURRENCY, len(sections))):
+            thread = threading.Thread(target=_fetch)
+            thread.daemon = True
+            thread.start()
 
         _divisor, _percent_value = self._get_progress_data(sections, 20)
         _percent = dialog.percent
 
-        for index, (server, section) in enumerate(sections):
+        trees = {}
+        while len(trees) < len(sections):
             if dialog.is_canceled():
+                cancelled.set()  # requests in flight are abandoned
                 return None
 
-            if index % _divisor == 0:
-                _percent += _percent_value
-
-            tree = None
-            if self.source == 'all':
-                dialog.update(_percent,
-                              i18n('Retrieving section data for %s...') % section.get_title())
-                if section.content_type() == 'tvshows':
-                    tree = (server, server.get_section_all(int(section.get_key()), item_type=4))
-                else:
-                    tree = (server, server.get_section_all(int(section.get_key())))
-            elif self.source == 'on_deck':
-                dialog.update(_percent,
-                              i18n('Retrieving section data for %s...') % section.get_title())
-                tree = (server, server.get_ondeck(section=int(section.get_key())))
-            elif self.source == 'recent_added':
-                dialog.update(_percent,
-                              i18n('Retrieving section data for %s...') % section.get_title())
-                tree = (server, server.get_recently_added(section=int(section.get_key())))
-            elif self.source == 'recent_released':
-                dialog.update(_percent,
-                              i18n('Retrieving section data for %s...') % section.get_title())
-                tree = (server, server.get_newest(section=int(section.get_key())))
-
-            if not tree:
+            try:
+                index, server, section, tree = completed.get(timeout=0.1)
+            except queue.Empty:
                 continue
 
-            trees.append(tree)
+            if len(trees) % _divisor == 0:
+                _percent += _percent_value
+            dialog.update(_percent,
+                          i18n('Retrieving section data for %s...') % section.get_title())
+
+            trees[index] = (server, tree)
 
-        return trees
+        return [trees[index] for index in range(len(sections)) if trees[index][1] is not None]
 
     def _get_sample(self, item_collections):
         if self.shuffle:
@@ -544,7 +612,14 @@ class PlaylistGenerator:
         else:
             samples = self._get_selection_sample(item_collections)
 
-        return [(sample[1][0], sample[1][1]) for sample in samples if sample is not None]
+        items = []
+        for sample in samples:
+            if sample is None:
+                continue
+            item = self._create_item(*sample)
+            items.append((item[0], item[1]))
+
+        return items
 
     @staticmethod
     def _get_distributed_by_server(trees):
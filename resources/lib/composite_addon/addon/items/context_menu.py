@@ -16,10 +16,16 @@ from ..constants import COMMANDS
 from ..constants import CONFIG
 from ..constants import MODES
 from ..logger import Logger
+from ..strings import current_language
 from ..strings import i18n
 
 LOG = Logger()
 
+# compiled context menu templates, keyed by (server uuid, item type, source, settings, language)
+TEMPLATES = {}
+# url path details, keyed by url, items in a listing usually share the same url
+URL_DETAILS = {}
+
 
 class ContextMenu:
 
@@ -27,148 +33,190 @@ class ContextMenu:
         self.context = context
         self.server = server
         self.data = data
-
-        self.parsed_url = None
-        if url:
-            self.parsed_url = urlparse(url)
+        self.url = url
 
         self.item_id = self.data.get('ratingKey', '0')
         self.item_type = self.data.get('type', '').lower()
 
-        self._context_menu = []
-        self.create()
+        self._context_menu = None
 
     @property
     def menu(self):
+        if self._context_menu is None:
+            self.create()
         return self._context_menu
 
+    def build(self):
+        """
+        Used to defer building the context menu until it's required,
+        see GUIItem.context_menu
+        """
+        return self.menu
+
     def create(self):
-        if not self.parsed_url:
+        self._context_menu = []
+
+        url_path, section = get_url_details(self.url)
+        if url_path is None:
             return
 
-        self._add_go_to_season()
-        self._add_go_to_show()
-        self._add_mark_watched()
-        self._add_mark_unwatched()
-        self._add_delete_from_playlist()
-        self._add_add_to_playlist()
-        self._add_delete_playlist()
-        self._add_delete()
-        self._add_audio()
-        self._add_subtitles()
-        self._add_update_library()
-        self._add_refresh()
+        template = get_template(self.context, self.server, self.item_type,
+                                self.data.get('source', '').lower())
+
+        self._add_go_to_season(template)
+        self._add_go_to_show(template)
+        self._add_static(template, 'mark_watched')
+        self._add_static(template, 'mark_unwatched')
+        self._add_delete_from_playlist(template, url_path)
+        self._add_add_to_playlist(template)
+        self._add_delete_playlist(template)
+        self._add_static(template, 'delete')
+        self._add_static(template, 'audio')
+        self._add_static(template, 'subtitles')
+        self._add_update_library(template, section)
+        self._context_menu.append(template['refresh'])
 
         LOG.debug('Using context menus:\n%s' % '\n'.join(map(str, self._context_menu)))
 
-    def _add_go_to_season(self):
+    def _add_static(self, template, name):
+        entry = template.get(name)
+        if entry:
+            self._context_menu.append((entry[0], entry[1] % self.item_id))
+
+    def _add_go_to_season(self, template):
         if self.data.get('additional_context_menus', {}).get('go_to'):
             parent_id = self.data.get('parentRatingKey')
             if parent_id and self.data.get('season') is not None:
                 self._context_menu.append(
-                    (i18n('Go to') % (i18n('Season') + ' ' + str(self.data.get('season', 0))),
-                     'Container.Update(plugin://%s/?mode=%s&url=%s&rating_key=%s)' %
-                     (CONFIG['id'], MODES.TVEPISODES, self.server.get_uuid(), parent_id))
+                    (template['go_to'] % (template['season'] + ' ' +
+                                          str(self.data.get('season', 0))),
+                     template['go_to_season'] % parent_id)
                 )
 
-    def _add_go_to_show(self):
+    def _add_go_to_show(self, template):
         if self.data.get('additional_context_menus', {}).get('go_to'):
             grandparent_id = self.data.get('grandparentRatingKey')
 
             if grandparent_id and self.data.get('tvshowtitle') is not None:
                 self._context_menu.append(
-                    (i18n('Go to') % self.data.get('tvshowtitle'),
-                     'Container.Update(plugin://%s/?mode=%s&url=%s&rating_key=%s)' %
-                     (CONFIG['id'], MODES.TVSEASONS, self.server.get_uuid(), grandparent_id))
+                    (template['go_to'] % self.data.get('tvshowtitle'),
+                     template['go_to_show'] % grandparent_id)
                 )
 
-    def _add_mark_watched(self):
-        if self.item_type in ['video', 'season']:
-            self._context_menu.append(
-                (i18n('Mark as watched'),
-                 'RunScript(' + CONFIG['id'] + ', %s, %s, %s, %s)' %
-                 (COMMANDS.WATCH, self.server.get_uuid(), self.item_id, 'watch'))
-            )
-
-    def _add_mark_unwatched(self):
-        if self.item_type in ['video', 'season']:
-            self._context_menu.append(
-                (i18n('Mark as unwatched'),
-                 'RunScript(' + CONFIG['id'] + ', %s, %s, %s, %s)' %
-                 (COMMANDS.WATCH, self.server.get_uuid(), self.item_id, 'unwatch'))
-            )
-
-    def _add_delete_from_playlist(self):
+    def _add_delete_from_playlist(self, template, url_path):
         if self.data.get('playlist_item_id'):
             playlist_title = self.data.get('playlist_title')
-            playlist_url = self.data.get('playlist_url', self.parsed_url.path)
+            playlist_url = self.data.get('playlist_url', url_path)
+            label, action = template['delete_from_playlist']
             self._context_menu.append(
-                (i18n('Delete from playlist'),
-                 'RunScript(' + CONFIG['id'] + ', %s, %s, %s, %s, %s, %s)'
-                 % (COMMANDS.DELETEFROMPLAYLIST, self.server.get_uuid(), self.item_id,
-                    playlist_title, self.data.get('playlist_item_id'), playlist_url))
+                (label, action % (self.item_id, playlist_title,
+                                  self.data.get('playlist_item_id'), playlist_url))
             )
 
-    def _add_add_to_playlist(self):
+    def _add_add_to_playlist(self, template):
         if self.data.get('library_section_uuid'):
-            playlist_type = ''
-            if self.item_type == 'music':
-                playlist_type = 'audio'
-            elif self.item_type == 'video':
-                playlist_type = 'video'
-            elif self.item_type == 'image':
-                playlist_type = 'photo'
-
+            label, action = template['add_to_playlist']
             self._context_menu.append(
-                (i18n('Add to playlist'),
-                 'RunScript(' + CONFIG['id'] + ', %s, %s, %s, %s, %s)' %
-                 (COMMANDS.ADDTOPLAYLIST, self.server.get_uuid(), self.item_id,
-                  self.data.get('library_section_uuid'), playlist_type))
+                (label, action % (self.item_id, self.data.get('library_section_uuid')))
             )
 
-    def _add_delete_playlist(self):
+    def _add_delete_playlist(self, template):
         if self.data.get('playlist') is True:
-            self._context_menu.append(
-                (i18n('Delete playlist'),
-                 'RunScript(' + CONFIG['id'] + ', %s, %s, %s)' %
-                 (COMMANDS.DELETEPLAYLIST, self.server.get_uuid(), self.item_id))
-            )
+            label, action = template['delete_playlist']
+            self._context_menu.append((label, action % self.item_id))
 
-    def _add_delete(self):
-        if self.context.settings.show_delete_context_menu():
-            self._context_menu.append(
-                (i18n('Delete'), 'RunScript(' + CONFIG['id'] + ', %s, %s, %s)' %
-                 (COMMANDS.DELETE, self.server.get_uuid(), self.item_id))
-            )
+    def _add_update_library(self, template, section):
+        if section is not None:
+            label, action = template['update_library']
+            self._context_menu.append((label, action % section))
 
-    def _add_audio(self):
-        item_source = self.data.get('source', '').lower()
-        if self.item_type == 'video' and item_source in ['tvepisodes', 'movies']:
-            self._context_menu.append(
-                (i18n('Audio'), 'RunScript(' + CONFIG['id'] + ', %s, %s, %s)' %
-                 (COMMANDS.AUDIO, self.server.get_uuid(), self.item_id))
-            )
 
-    def _add_subtitles(self):
-        item_source = self.data.get('source', '').lower()
-        if self.item_type == 'video' and item_source in ['tvepisodes', 'movies']:
-            self._context_menu.append(
-                (i18n('Subtitles'), 'RunScript(' + CONFIG['id'] + ', %s, %s, %s)' %
-                 (COMMANDS.SUBS, self.server.get_uuid(), self.item_id))
-            )
+def get_url_details(url):
+    """
+    Get the path and library section of a listing url, parsed once per url
+
+    :param url: url of the listing the item belongs to
+    :return: tuple (path, section), (None, None) if no url
+    """
+    if not url:
+        return None, None
 
-    def _add_update_library(self):
+    details = URL_DETAILS.get(url)
+    if details is None:
+        path = urlparse(url).path
         try:
-            section = self.parsed_url.path.split('/')[3]
-            self._context_menu.append(
-                (i18n('Update library'), 'RunScript(' + CONFIG['id'] + ', %s, %s, %s)' %
-                 (COMMANDS.UPDATE, self.server.get_uuid(), section))
-            )
+            section = path.split('/')[3]
         except IndexError:
-            pass
-
-    def _add_refresh(self):
-        self._context_menu.append(
-            (i18n('Refresh'),
-             'RunScript(' + CONFIG['id'] + ', %s)' % COMMANDS.REFRESH)
-        )
+            section = None
+        details = (path, section)
+        URL_DETAILS[url] = details
+
+    return details
+
+
+def get_template(context, server, item_type, source):
+    """
+    Get the compiled context menu template for this server, item type and settings
+    Only the per-item ids are substituted when the menu is created
+
+    :param context: context object
+    :param server: PlexMediaServer object the items belong to
+    :param item_type: lower case item type ie. video, season, music
+    :param source: lower case item source ie. movies, tvepisodes
+    :return: dict of labels and action format strings
+    """
+    show_delete = context.settings.show_delete_context_menu()
+    key = (server.get_uuid(), item_type, source, show_delete, current_language())
+
+    template = TEMPLATES.get(key)
+    if template is None:
+        template = _compile_template(server.get_uuid(), item_type, source, show_delete)
+        TEMPLATES[key] = template
+
+    return template
+
+
+def _compile_template(server_uuid, item_type, source, show_delete):
+    script = 'RunScript(' + CONFIG['id'] + ', %s, ' + str(server_uuid) + ', %s)'
+    container = 'Container.Update(plugin://' + CONFIG['id'] + '/?mode=%s&url=' + \
+                str(server_uuid) + '&rating_key=%%s)'
+
+    template = {
+        'go_to': i18n('Go to'),
+        'season': i18n('Season'),
+        'go_to_season': container % MODES.TVEPISODES,
+        'go_to_show': container % MODES.TVSEASONS,
+        'delete_from_playlist': (i18n('Delete from playlist'),
+                                 script % (COMMANDS.DELETEFROMPLAYLIST, '%s, %s, %s, %s')),
+        'add_to_playlist': (i18n('Add to playlist'),
+                            script % (COMMANDS.ADDTOPLAYLIST,
+                                      '%s, %s, ' + _playlist_type(item_type))),
+        'delete_playlist': (i18n('Delete playlist'), script % (COMMANDS.DELETEPLAYLIST, '%s')),
+        'update_library': (i18n('Update library'), script % (COMMANDS.UPDATE, '%s')),
+        'refresh': (i18n('Refresh'), 'RunScript(' + CONFIG['id'] + ', %s)' % COMMANDS.REFRESH),
+    }
+
+    if item_type in ['video', 'season']:
+        template['mark_watched'] = (i18n('Mark as watched'),
+                                    script % (COMMANDS.WATCH, '%s, watch'))
+        template['mark_unwatched'] = (i18n('Mark as unwatched'),
+                                      script % (COMMANDS.WATCH, '%s, unwatch'))
+
+    if show_delete:
+        template['delete'] = (i18n('Delete'), script % (COMMANDS.DELETE, '%s'))
+
+    if item_type == 'video' and source in ['tvepisodes', 'movies']:
+        template['audio'] = (i18n('Audio'), script % (COMMANDS.AUDIO, '%s'))
+        template['subtitles'] = (i18n('Subtitles'), script % (COMMANDS.SUBS, '%s'))
+
+    return template
+
+
+def _playlist_type(item_type):
+    if item_type == 'music':
+        return 'audio'
+    if item_type == 'video':
+        return 'video'
+    if item_type == 'image':
+        return 'photo'
+    return ''
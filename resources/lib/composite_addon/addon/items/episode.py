@@ -124,7 +124,7 @@ def create_episode_item(context, item, library=False):
     # Build any specific context menu entries
     context_menu = None
     if not context.settings.skip_context_menus():
-        context_menu = ContextMenu(context, item.server, item.url, extra_data).menu
+        context_menu = ContextMenu(context, item.server, item.url, extra_data).build
 
     extra_data['mode'] = MODES.PLAYLIBRARY
     if library:
@@ -18,6 +18,7 @@ from six.moves.urllib_parse import urlparse
 
 from ..common import get_argv
 from ..constants import CONFIG
+from ..containers import GUIItem
 from ..logger import Logger
 from ..strings import i18n
 from ..strings import item_translate
@@ -26,6 +27,20 @@ LOG = Logger()
 
 
 def create_gui_item(context, item):
+    payload = create_gui_payload(context, item)
+    if context.payloads:
+        return payload
+    return create_list_item(payload)
+
+
+def create_gui_payload(context, item):
+    """
+    Create a serializable payload with everything required to create the list item
+
+    :param context: context object
+    :param item: GUIItem
+    :return: dict, see create_list_item
+    """
     LOG.debug('Adding %s\n'
               'Info Labels: %s\n'
               'Extra: %s' %
@@ -39,53 +54,84 @@ def create_gui_item(context, item):
     title = item_translate(item.info_labels.get('title', i18n('Unknown')),
                            item.extra.get('source'), item.is_folder)
 
-    if CONFIG['kodi_version'] >= 18:
-        list_item = item.CONSTRUCTOR(title, offscreen=True)
-    else:
-        list_item = item.CONSTRUCTOR(title)
-
     # Set the properties of the item, such as summary, name, season, etc
     info_type, info_labels = _get_info(item)
-    list_item.setInfo(type=info_type, infoLabels=info_labels)
 
+    stream_info = None
     if (not context.settings.skip_flags() and
             not item.is_folder and
             item.extra.get('type', 'video').lower() == 'video'):
         stream_info = item.extra.get('stream_info', {})
-        list_item.addStreamInfo('video', stream_info.get('video', {}))
-        list_item.addStreamInfo('audio', stream_info.get('audio', {}))
 
-    list_item.setArt(_get_art(item))
+    # context menus aren't used during a Kodi library scan, don't build them
+    use_context_menu = not _is_library_item(item)
 
-    if item.context_menu is not None:
+    context_menu = None
+    if use_context_menu and item.context_menu is not None:
+        context_menu = item.context_menu
         if not item.is_folder and item.extra.get('type', 'video').lower() == 'video':
             # Play Transcoded
-            item.context_menu.insert(0, (i18n('Play Transcoded'),
-                                         'PlayMedia(%s&transcode=1)' % url))
+            context_menu.insert(0, (i18n('Play Transcoded'), 'PlayMedia(%s&transcode=1)' % url))
             LOG.debug('Setting transcode options to [%s&transcode=1]' % url)
-        LOG.debug('Building Context Menus')
-        list_item.addContextMenuItems(item.context_menu)
 
     item_properties = _get_properties(context, item)
+
+    if item.url.startswith('cmd:'):
+        item.is_folder = False
+
+    return {
+        'url': url,
+        'title': title,
+        'info_type': info_type,
+        'info_labels': info_labels,
+        'stream_info': stream_info,
+        'art': _get_art(item),
+        'context_menu': context_menu,
+        'properties': item_properties,
+        'is_folder': item.is_folder,
+    }
+
+
+def create_list_item(payload):
+    """
+    :param payload: payload created by create_gui_payload
+    :return: tuple (url, list item, is folder) ready for xbmcplugin.addDirectoryItems
+    """
     if CONFIG['kodi_version'] >= 18:
-        list_item.setProperties(item_properties)
+        list_item = GUIItem.CONSTRUCTOR(payload['title'], offscreen=True)
+    else:
+        list_item = GUIItem.CONSTRUCTOR(payload['title'])
+
+    list_item.setInfo(type=payload['info_type'], infoLabels=payload['info_labels'])
+
+    stream_info = payload['stream_info']
+    if stream_info is not None:
+        list_item.addStreamInfo('video', stream_info.get('video', {}))
+        list_item.addStreamInfo('audio', stream_info.get('audio', {}))
+
+    list_item.setArt(payload['art'])
+
+    if payload['context_menu'] is not None:
+        LOG.debug('Building Context Menus')
+        list_item.addContextMenuItems(payload['context_menu'])
+
+    if CONFIG['kodi_version'] >= 18:
+        list_item.setProperties(payload['properties'])
     else:
         set_property = list_item.setProperty
-        _item_properties = item_properties.items()
+        _item_properties = payload['properties'].items()
         for key, value in _item_properties:
             set_property(key, value)
 
-    if item.url.startswith('cmd:'):
-        item.is_folder = False
-
-    return url, list_item, item.is_folder
+    return payload['url'], list_item, payload['is_folder']
 
 
 def _get_url(item):
     path_mode = item.extra.get('path_mode')
     plugin_url = get_argv()[0]
     url_parts = urlparse(plugin_url)
-    plugin_url = 'plugin://%s/' % url_parts.netloc
+    # the service creates widget payloads, its argv isn't a plugin url
+    plugin_url = 'plugin://%s/' % (url_parts.netloc or CONFIG['id'])
     if path_mode and '/' in path_mode:
         plugin_url += path_mode.rstrip('/') + '/'
 
@@ -105,6 +151,11 @@ def _get_url(item):
     return url
 
 
+def _is_library_item(item):
+    path_mode = item.extra.get('path_mode')
+    return bool(path_mode) and path_mode.startswith('library/')
+
+
 def _get_info(item):
     info_type = item.extra.get('type', 'Video')
     info_labels = copy.deepcopy(item.info_labels)
@@ -71,7 +71,7 @@ def create_season_item(context, item, library=False):
 
     context_menu = None
     if not context.settings.skip_context_menus():
-        context_menu = ContextMenu(context, item.server, item_url, item.data).menu
+        context_menu = ContextMenu(context, item.server, item_url, item.data).build
 
     if library:
         extra_data['path_mode'] = MODES.TXT_TVSHOWS_LIBRARY
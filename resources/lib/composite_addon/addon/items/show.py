@@ -90,7 +90,7 @@ def create_show_item(context, item, library=False):
 
     context_menu = None
     if not context.settings.skip_context_menus():
-        context_menu = ContextMenu(context, item.server, item.url, extra_data).menu
+        context_menu = ContextMenu(context, item.server, item.url, extra_data).build
 
     if library:
         extra_data['hash'] = _md5_hash(item.data)
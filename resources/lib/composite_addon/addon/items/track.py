@@ -90,7 +90,7 @@ def create_track_item(context, item, listing=True):
     # Build any specific context menu entries
     context_menu = None
     if not context.settings.skip_context_menus():
-        context_menu = ContextMenu(context, item.server, item_url, extra_data).menu
+        context_menu = ContextMenu(context, item.server, item_url, extra_data).build
 
     if listing:
         gui_item = GUIItem(item_url, info_labels, extra_data, context_menu)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2020 Composite (plugin.video.composite_for_plex)
+
+    This file is part of Composite (plugin.video.composite_for_plex)
+
+    SPDX-License-Identifier: GPL-2.0-or-later
+    See LICENSES/GPL-2.0-or-later.txt for more information.
+"""
+
+import re
+import time
+import xml.etree.ElementTree as ETree
+
+from .cache_control import CacheControl
+from .json_store import JSONStore
+from .logger import Logger
+
+LOG = Logger('library_sync')
+
+LIBRARY_CACHE = CacheControl('library')
+
+METADATA_RE = re.compile(r'/library/metadata/(?P<rating_key>[0-9]+)')
+# seconds between full listings of a section, an item count can't tell a removed item
+# from one replaced by a new item
+FULL_SYNC_INTERVAL = 24 * 3600
+
+
+class LibrarySyncStore(JSONStore):
+    """
+    updatedAt high-water marks of the sections synced to the Kodi library,
+    the section listings are stored in LIBRARY_CACHE
+    """
+
+    def __init__(self):
+        JSONStore.__init__(self, 'library_sync.json')
+
+    def set_defaults(self):
+        pass
+
+    def get_mark(self, uuid, section):
+        return self.get_data().get(uuid, {}).get(str(section))
+
+    def set_mark(self, uuid, section, updated_at, size, full_sync):
+        data = self.get_data()
+        if uuid not in data:
+            data[uuid] = {}
+
+        data[uuid][str(section)] = {
+            'updated_at': updated_at,
+            'size': size,
+            'full_sync': full_sync,
+        }
+        self.save(data)
+
+    def get_sections(self, uuid):
+        return list(self.get_data().get(uuid, {}).keys())
+
+
+def _cache_name(uuid, section):
+    return 'library_%s_%s.cache' % (uuid, section)
+
+
+def _index_cache_name(uuid):
+    return 'library_%s_index.cache' % uuid
+
+
+def _update_index(uuid, section, listing):
+    """
+    Store the rating keys of a section listing in the index of the server, contains()
+    reads the index instead of every section listing
+    Keys that were listed before and are missing from the listing are kept as deleted
+    """
+    _, index = LIBRARY_CACHE.read_cache(_index_cache_name(uuid))
+    if not isinstance(index, dict) or 'sections' not in index:
+        index = {
+            'sections': {},  # section -> rating keys of the listing
+            'deleted': set(),  # rating keys removed from a section since they were listed
+        }
+
+    keys = set(listing['items'].keys())
+    previous = index['sections'].get(str(section), set())
+    index['deleted'] = (index['deleted'] | (previous - keys)) - keys
+    index['sections'][str(section)] = keys
+    LIBRARY_CACHE.write_cache(_index_cache_name(uuid), index)
+
+
+def _listing_tree(listing):
+    tree = ETree.Element('MediaContainer', listing['container'])
+    for element in listing['items'].values():
+        tree.append(ETree.fromstring(element))
+    return tree
+
+
+def _updated_at(tree, updated_at=0):
+    for element in tree:
+        try:
+            updated_at = max(updated_at, int(element.get('updatedAt', 0)))
+        except ValueError:
+            continue
+    return updated_at
+
+
+def sync(server, section):
+    """
+    Update the stored listing of a section with the items changed since the last sync,
+    the full section is requested for the first sync, when the item count differs and
+    every FULL_SYNC_INTERVAL
+
+    :param server: server object
+    :param section: section key
+    :return: tree with all items of the section, or None if the section couldn't be synced
+    """
+    store = LibrarySyncStore()
+    uuid = server.get_uuid()
+    mark = store.get_mark(uuid, section)
+
+    listing = None
+    updated_at = 0
+    full_sync = 0
+    if mark and time.time() - mark.get('full_sync', 0) < FULL_SYNC_INTERVAL:
+        _, listing = LIBRARY_CACHE.read_cache(_cache_name(uuid, section))
+        full_sync = mark['full_sync']
+
+    if mark and listing:
+        total_size = server.get_section_size(section)
+        tree = server.get_section_changes(section, mark['updated_at'])
+        if total_size is None or tree is None:
+            return None
+
+        for element in tree:
+            if element.get('ratingKey'):
+                listing['items'][element.get('ratingKey')] = ETree.tostring(element)
+        listing['container'] = dict(tree.attrib)
+        updated_at = _updated_at(tree, mark['updated_at'])
+
+        if len(listing['items']) == total_size:
+            LOG.debug('Synced %s changed items of %s/%s' % (len(tree), uuid, section))
+        else:
+            LOG.debug('Section %s/%s has %s items, %s stored, requesting all items' %
+                      (uuid, section, total_size, len(listing['items'])))
+            listing = None
+
+    if not listing:
+        tree = server.get_section_changes(section)
+        if tree is None:
+            return None
+
+        listing = {
+            'container': dict(tree.attrib),
+            'items': dict((element.get('ratingKey'), ETree.tostring(element))
+                          for element in tree if element.get('ratingKey')),
+        }
+        updated_at = _updated_at(tree)
+        full_sync = time.time()
+        LOG.debug('Synced all %s items of %s/%s' % (len(listing['items']), uuid, section))
+
+    LIBRARY_CACHE.write_cache(_cache_name(uuid, section), listing)
+    _update_index(uuid, section, listing)
+    store.set_mark(uuid, section, updated_at, len(listing['items']), full_sync)
+
+    return _listing_tree(listing)
+
+
+def contains(uuid, url):
+    """
+    Check if a synced section contains the item of an url
+
+    :param uuid: server uuid
+    :param url: item url ie. .../library/metadata/1234
+    :return: True if a synced listing contains the item, False if the item was removed
+             from a synced section, None if the synced listings can't answer ie. for
+             episodes, which aren't part of the listings of a show section
+    """
+    match = METADATA_RE.search(url or '')
+    if not match:
+        return None
+
+    sections = LibrarySyncStore().get_sections(uuid)
+    if not sections:
+        return None
+
+    _, index = LIBRARY_CACHE.read_cache(_index_cache_name(uuid))
+    if not isinstance(index, dict) or 'sections' not in index:
+        return None
+
+    rating_key = match.group('rating_key')
+    if any(rating_key in keys for keys in index['sections'].values()):
+        return True
+
+    if rating_key in index['deleted']:
+        return False
+
+    return None
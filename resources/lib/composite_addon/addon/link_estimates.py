@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2020 Composite (plugin.video.composite_for_plex)
+
+    This file is part of Composite (plugin.video.composite_for_plex)
+
+    SPDX-License-Identifier: GPL-2.0-or-later
+    See LICENSES/GPL-2.0-or-later.txt for more information.
+"""
+
+import threading
+import time
+
+from .json_store import JSONStore
+from .logger import Logger
+
+LOG = Logger('link_estimates')
+
+# weight of a new sample in the moving averages
+SMOOTHING = 0.3
+# smaller downloads only update the round trip time, they aren't limited by the link
+MIN_THROUGHPUT_BYTES = 1024 * 1024
+# seconds between saves of the passively updated estimates
+SAVE_INTERVAL = 60
+# estimates older than this aren't used for playback decisions
+MAX_AGE = 6 * 3600
+# share of the measured throughput that playback may use
+HEADROOM = 0.8
+
+
+class LinkEstimateStore(JSONStore):
+    """
+    Round trip time and throughput estimates per server connection
+
+    {
+        '<server uuid>|<address>:<port>': {
+            'rtt': 0.05,  # seconds
+            'throughput': 1250000.0,  # bytes per second
+            'samples': 12,
+            'updated': 1600000000.0
+        }
+    }
+    """
+
+    def __init__(self):
+        JSONStore.__init__(self, 'link_estimates.json')
+
+    def set_defaults(self):
+        pass
+
+    def get_estimate(self, connection):
+        return self.get_data().get(connection)
+
+    def set_estimate(self, connection, estimate):
+        self.load()  # the plugin and the service both record samples
+        data = self.get_data()
+        data[connection] = estimate
+        self.save(data)
+
+
+_LOCK = threading.Lock()
+_ESTIMATES = {}
+_SAVED = {}
+
+
+def _average(current, sample):
+    if current is None:
+        return sample
+    return current + SMOOTHING * (sample - current)
+
+
+def record(connection, rtt, size=0, duration=0.0, save=False):
+    """
+    Add a sample to the estimates of a connection
+
+    :param connection: connection key, see PlexMediaServer.get_connection_key
+    :param rtt: seconds until the response headers were received
+    :param size: bytes of the response body, only probe downloads measure the throughput
+    :param duration: seconds of the whole request
+    :param save: save the estimate right away, passive samples are saved every SAVE_INTERVAL
+    """
+    with _LOCK:
+        estimate = _ESTIMATES.get(connection)
+        if estimate is None:
+            estimate = dict(LinkEstimateStore().get_estimate(connection) or {})
+
+        estimate['rtt'] = _average(estimate.get('rtt'), rtt)
+
+        transfer_time = duration - rtt
+        if size >= MIN_THROUGHPUT_BYTES and transfer_time > 0:
+            estimate['throughput'] = _average(estimate.get('throughput'), size / transfer_time)
+
+        estimate['samples'] = estimate.get('samples', 0) + 1
+        estimate['updated'] = time.time()
+        _ESTIMATES[connection] = estimate
+
+        save = save or time.time() - _SAVED.get(connection, 0) >= SAVE_INTERVAL
+        if save:
+            _SAVED[connection] = time.time()
+        estimate = dict(estimate)
+
+    if save:
+        LinkEstimateStore().set_estimate(connection, estimate)
+
+
+def get(connection):
+    """
+    :param connection: connection key, see PlexMediaServer.get_connection_key
+    :return: estimate dict or None if there is no recent estimate
+    """
+    with _LOCK:
+        estimate = _ESTIMATES.get(connection)
+
+    if estimate is None:
+        estimate = LinkEstimateStore().get_estimate(connection)
+
+    if not estimate or time.time() - estimate.get('updated', 0) > MAX_AGE:
+        return None
+
+    return estimate
+
+
+def usable_bitrate(connection):
+    """
+    :param connection: connection key, see PlexMediaServer.get_connection_key
+    :return: bitrate in kbps that playback can sustain, or None if the throughput is unknown
+    """
+    estimate = get(connection)
+    if not estimate or not estimate.get('throughput'):
+        return None
+
+    return int(estimate['throughput'] * 8 / 1000 * HEADROOM)
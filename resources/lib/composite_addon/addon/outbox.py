@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2020 Composite (plugin.video.composite_for_plex)
+
+    This file is part of Composite (plugin.video.composite_for_plex)
+
+    SPDX-License-Identifier: GPL-2.0-or-later
+    See LICENSES/GPL-2.0-or-later.txt for more information.
+"""
+
+from six import iteritems
+
+from .json_store import JSONStore
+from .logger import Logger
+
+LOG = Logger('outbox')
+
+# seconds between attempts to flush the outbox
+FLUSH_INTERVAL = 60
+
+
+class OutboxStore(JSONStore):
+    """
+    Playback progress and watch state changes that couldn't be sent to a server,
+    one entry per server and rating key holding the latest resume offset and watched flag
+
+    {
+        'sequence': 3,
+        'servers': {
+            '<server uuid>': {
+                '<rating key>': {
+                    'sequence': 3,
+                    'progress': {'time': 60000, 'duration': 1200000, 'sequence': 2},
+                    'watched': {'value': True, 'sequence': 3}
+                }
+            }
+        }
+    }
+    """
+
+    def __init__(self):
+        JSONStore.__init__(self, 'outbox.json')
+
+    def set_defaults(self):
+        data = self.get_data()
+        if not data:
+            data = {}
+
+        if 'sequence' not in data:
+            data['sequence'] = 0
+
+        if 'servers' not in data:
+            data['servers'] = {}
+
+        self.save(data)
+
+    def _record(self, server_uuid, media_id, change, value):
+        self.load()  # the plugin and the service both record changes
+        data = self.get_data()
+        data['sequence'] += 1
+
+        entries = data['servers'].setdefault(server_uuid, {})
+        entry = entries.setdefault(str(media_id), {'progress': None, 'watched': None})
+
+        value['sequence'] = data['sequence']
+        entry[change] = value  # replaces the redundant older change
+        entry['sequence'] = data['sequence']
+
+        self.save(data)
+
+    def record_progress(self, server_uuid, media_id, watched_time, duration):
+        LOG.debug('[%s/%s]: queued resume offset %s' % (server_uuid, media_id, watched_time))
+        self._record(server_uuid, media_id, 'progress', {
+            'time': watched_time,
+            'duration': duration,
+        })
+
+    def record_watched(self, server_uuid, media_id, watched):
+        LOG.debug('[%s/%s]: queued watched %s' % (server_uuid, media_id, watched))
+        self._record(server_uuid, media_id, 'watched', {
+            'value': watched,
+        })
+
+    def entries(self):
+        """
+        :return: list of tuples (server uuid, rating key, entry) in the order they were recorded
+        """
+        entries = []
+        for server_uuid, server_entries in iteritems(self.get_data()['servers']):
+            for media_id, entry in iteritems(server_entries):
+                entries.append((server_uuid, media_id, entry))
+
+        return sorted(entries, key=lambda entry: entry[2]['sequence'])
+
+    def remove(self, server_uuid, media_id, sequence):
+        """
+        Remove a sent entry, unless it was changed since it was read
+        """
+        self.load()
+        data = self.get_data()
+        entries = data['servers'].get(server_uuid, {})
+        entry = entries.get(media_id)
+        if entry is None or entry['sequence'] != sequence:
+            return
+
+        del entries[media_id]
+        if not entries:
+            del data['servers'][server_uuid]
+
+        self.save(data)
+
+    def __bool__(self):
+        return bool(self.get_data()['servers'])
+
+    __nonzero__ = __bool__
+
+
+def _replay(server, media_id, entry):
+    """
+    Send the changes of an entry in the order they were made, all changes are idempotent
+
+    :return: True if all changes were accepted
+    """
+    changes = [(change, entry[change]) for change in ('progress', 'watched') if entry[change]]
+    changes.sort(key=lambda change: change[1]['sequence'])
+
+    # a failed request marks the server offline and talk() skips offline servers,
+    # every replay has to reach the network
+    server.offline = False
+
+    for change, value in changes:
+        if change == 'progress':
+            sent = server.report_playback_progress(media_id, value['time'], state='stopped',
+                                                   duration=value['duration'])
+        elif value['value']:
+            sent = server.mark_item_watched(media_id)
+        else:
+            sent = server.mark_item_unwatched(media_id)
+
+        if not sent:
+            return False
+
+    return True
+
+
+def flush(plex_network):
+    """
+    Send the queued changes to the servers that are back online, stops at the first
+    failure per server to keep the order of its changes
+
+    :param plex_network: plex network object
+    :return: True if the outbox is empty
+    """
+    store = OutboxStore()
+    failed = set()
+
+    for server_uuid, media_id, entry in store.entries():
+        if server_uuid in failed:
+            continue
+
+        try:
+            server = plex_network.get_server_from_uuid(server_uuid)
+        except KeyError:
+            server = None
+
+        if server is None or not _replay(server, media_id, entry):
+            LOG.debug('[%s]: server unavailable, keeping queued changes' % server_uuid)
+            failed.add(server_uuid)
+            continue
+
+        LOG.debug('[%s/%s]: queued changes sent' % (server_uuid, media_id))
+        store.remove(server_uuid, media_id, entry['sequence'])
+
+    return not store
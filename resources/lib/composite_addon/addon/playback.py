@@ -10,6 +10,9 @@
     See LICENSES/GPL-2.0-or-later.txt for more information.
 """
 
+import threading
+import time
+
 from six.moves import xrange
 from six.moves.urllib_parse import unquote
 
@@ -18,6 +21,7 @@ from kodi_six import xbmcgui  # pylint: disable=import-error
 from kodi_six import xbmcplugin  # pylint: disable=import-error
 from kodi_six import xbmcvfs  # pylint: disable=import-error
 
+from .cache_control import CacheControl
 from .common import get_handle
 from .common import is_resuming_video
 from .constants import CONFIG
@@ -28,14 +32,21 @@ from .items.common import get_fanart_image
 from .items.common import get_thumb_image
 from .items.track import create_track_item
 from .logger import Logger
+from .playback_handoff import publish as publish_playback_context
 from .strings import encode_utf8
 from .strings import i18n
 from .utils import get_file_type
 from .utils import get_xml
-from .utils import write_pickled
 
 LOG = Logger()
 
+PREFETCH_CACHE = CacheControl('prefetch')
+# seconds a prefetched stream stays valid after the current episode would have ended,
+# the resume point of the next episode is only current within the Up Next window
+PREFETCH_MARGIN = 10 * 60
+# seconds playback start waits for lyrics, later lyrics are added once playback started
+LYRICS_BUDGET = 0.5
+
 
 def monitor_channel_transcode_playback(context, server, session_id):
     # Logic may appear backward, but this does allow for a failed start to be detected
@@ -66,6 +77,148 @@ def monitor_channel_transcode_playback(context, server, session_id):
     server.stop_transcode_session(session_id)
 
 
+def _prefetch_cache_name(server_uuid, media_id):
+    return 'stream_%s_%s.cache' % (server_uuid, media_id)
+
+
+def prefetch_stream(context, server, media_id, valid_for=0):
+    """
+    Resolve the stream data of a media item ahead of its playback, used for Up Next
+
+    :param context: context object, only the settings are required
+    :param server: server object
+    :param media_id: rating key of the item
+    :param valid_for: seconds until the item is expected to play, the remaining runtime
+                      of the current episode, PREFETCH_MARGIN is added
+    :return: the metadata element of the item or None
+    """
+    url = server.get_formatted_url('/library/metadata/%s' % media_id)
+    url += '&' if '?' in url else '?'
+    url += 'includeMarkers=1'
+
+    tree = server.processed_xml(url)
+    if tree is None or tree.get('message'):
+        return None
+
+    stream = StreamData(context, server, tree).stream
+    if not stream['parts']:
+        return None
+
+    PREFETCH_CACHE.write_cache(_prefetch_cache_name(server.get_uuid(), media_id), {
+        'stream': stream,
+        'expires': time.time() + valid_for + PREFETCH_MARGIN,
+    })
+    LOG.debug('Prefetched stream data for %s/%s' % (server.get_uuid(), media_id))
+    return tree.find('Video')
+
+
+def _take_prefetched_stream(server, media_id):
+    cache_name = _prefetch_cache_name(server.get_uuid(), media_id)
+    _, prefetched = PREFETCH_CACHE.read_cache(cache_name)
+    if prefetched is None:
+        return None
+
+    PREFETCH_CACHE.delete(cache_name)
+    if not isinstance(prefetched, dict) or prefetched.get('expires', 0) < time.time():
+        LOG.debug('Prefetched stream data for %s/%s expired' % (server.get_uuid(), media_id))
+        return None
+
+    LOG.debug('Using prefetched stream data for %s/%s' % (server.get_uuid(), media_id))
+    return prefetched.get('stream')
+
+
+def _fetch_lyrics(server, lyrics_id):
+    """
+    Fetch lyrics in the background while playback is prepared
+
+    :param server: server object
+    :param lyrics_id: id of the lyrics stream
+    :return: tuple (thread, result dict), the lyrics are stored in result['lyrics']
+    """
+    result = {}
+
+    def _fetch():
+        try:
+            result['lyrics'] = server.get_lyrics(lyrics_id)
+        except Exception as error:  # pylint: disable=broad-except
+            LOG.debug('Unable to fetch lyrics %s [%s]' % (lyrics_id, error))
+
+    thread = threading.Thread(target=_fetch)
+    thread.daemon = True
+    thread.start()
+
+    return thread, result
+
+
+def _join_lyrics(context, stream, stream_data, lyrics_fetch):
+    """
+    Wait up to LYRICS_BUDGET for the lyrics and add them to the stream data
+
+    :param context: context object
+    :param stream: stream dict, see StreamData
+    :param stream_data: info labels of the stream, the lyrics are added to
+    :param lyrics_fetch: tuple (thread, result dict), see _fetch_lyrics
+    """
+    thread, result = lyrics_fetch
+    # without the playback monitor the lyrics can't be added after playback started
+    if context.settings.playback_monitor_disabled():
+        thread.join()
+    else:
+        thread.join(LYRICS_BUDGET)
+
+    if result.get('lyrics'):
+        stream_data['lyrics'] = result['lyrics']
+        del stream['extra']['lyrics_id']
+    else:
+        LOG.debug('Lyrics will be added after playback started')
+
+
+def _get_stream(context, server, media_id, url):
+    """
+    :param context: context object
+    :param server: server object
+    :param media_id: rating key of the item
+    :param url: metadata url of the item
+    :return: stream dict, see StreamData, or None if the metadata couldn't be retrieved
+    """
+    # Up Next prefetches the stream data of the next episode
+    stream = _take_prefetched_stream(server, media_id)
+    if stream is not None:
+        return stream
+
+    tree = get_xml(context, url)
+    if tree is None:
+        return None
+
+    return StreamData(context, server, tree).stream
+
+
+def _get_transcode(context, server, stream, url, data):
+    """
+    :param context: context object
+    :param server: server object
+    :param stream: stream dict, see StreamData
+    :param url: media url, see MediaSelect
+    :param data: playback parameters
+    :return: dict of transcode settings, transcode, profile and max_bitrate in kbps or None
+    """
+    transcode = is_transcode_required(context, stream.get('details', [{}]), data['transcode'])
+    try:
+        transcode_profile = int(data['transcode_profile'])
+    except ValueError:
+        transcode_profile = 0
+
+    max_bitrate = None
+    if url.startswith('http'):
+        transcode, max_bitrate = get_transcode_decision(context, server, stream, transcode)
+
+    return {
+        'transcode': transcode,
+        'profile': transcode_profile,
+        'max_bitrate': max_bitrate,
+    }
+
+
 def play_media_id_from_uuid(context, data):
     server = context.plex_network.get_server_from_uuid(data['server_uuid'])
     data['url'] = server.get_formatted_url('/library/metadata/%s' % data['media_id'])
@@ -73,6 +226,8 @@ def play_media_id_from_uuid(context, data):
 
 
 def play_library_media(context, data):
+    start_time = time.time()
+
     up_next = True
     if '&upnext=false' in data['url']:
         up_next = False
@@ -85,11 +240,11 @@ def play_library_media(context, data):
         data['url'] += '&' if '?' in data['url'] else '?'
         data['url'] += 'includeMarkers=1'
 
-    tree = get_xml(context, data['url'])
-    if tree is None:
+    stream = _get_stream(context, server, media_id, data['url'])
+    if stream is None:
         return
 
-    stream = StreamData(context, server, tree).stream
+    metadata_time = time.time() - start_time
 
     stream_data = stream.get('full_data', {})
     stream_media = stream.get('media', {})
@@ -98,18 +253,18 @@ def play_library_media(context, data):
         play_playlist(context, server, stream)
         return
 
+    lyrics_fetch = None
+    if stream['extra'].get('lyrics_id'):
+        lyrics_fetch = _fetch_lyrics(server, stream['extra']['lyrics_id'])
+
     url = MediaSelect(context, server, stream).media_url
 
     if url is None:
         return
 
-    transcode = is_transcode_required(context, stream.get('details', [{}]), data['transcode'])
-    try:
-        transcode_profile = int(data['transcode_profile'])
-    except ValueError:
-        transcode_profile = 0
+    transcode_settings = _get_transcode(context, server, stream, url, data)
 
-    url, session = get_playback_url_and_session(server, url, stream, transcode, transcode_profile)
+    url, session = get_playback_url_and_session(server, url, stream, transcode_settings)
 
     details = {
         'resume': int(int(stream_media['viewOffset']) / 1000),
@@ -129,11 +284,14 @@ def play_library_media(context, data):
 
     LOG.debug('Resume has been set to %s' % details['resume'])
 
+    if lyrics_fetch is not None:
+        _join_lyrics(context, stream, stream_data, lyrics_fetch)
+
     list_item = create_playback_item(url, stream, stream_data, details)
 
     if stream['type'] in ['music', 'video']:
         server.settings = None  # can't pickle xbmcaddon.Addon()
-        write_pickled('playback_monitor.pickle', {
+        publish_playback_context(xbmcgui.Window(10000), url, {
             'details': details,
             'media_id': media_id,
             'playing_file': url,
@@ -142,13 +300,16 @@ def play_library_media(context, data):
             'stream': stream,
             'up_next': up_next,
             'callback_args': {
-                'transcode': transcode,
-                'transcode_profile': transcode_profile
+                'transcode': transcode_settings['transcode'],
+                'transcode_profile': transcode_settings['profile']
             }
         })
 
     xbmcplugin.setResolvedUrl(get_handle(), True, list_item)
 
+    LOG.debug('Playback of %s resolved in %.2fs, %.2fs for the metadata' %
+              (media_id, time.time() - start_time, metadata_time))
+
     set_now_playing_properties(server, media_id)
 
 
@@ -208,7 +369,10 @@ def set_now_playing_properties(server, media_id):
     window.setProperty('plugin.video.composite-nowplaying.id', media_id)
 
 
-def get_playback_url_and_session(server, url, streams, transcode, transcode_profile):
+def get_playback_url_and_session(server, url, streams, transcode_settings):
+    """
+    :param transcode_settings: dict of transcode settings, see _get_transcode
+    """
     protocol = url.split(':', 1)[0]
 
     if protocol == 'file':
@@ -217,10 +381,10 @@ def get_playback_url_and_session(server, url, streams, transcode, transcode_prof
 
     if protocol.startswith('http'):
         LOG.debug('We are playing a stream')
-        if transcode:
+        if transcode_settings['transcode']:
             LOG.debug('We will be transcoding the stream')
             return server.get_universal_transcode(streams['extra']['path'],
-                                                  transcode_profile=transcode_profile)
+                                                  transcode_profile=transcode_settings)
 
         return server.get_formatted_url(url), None
 
@@ -248,6 +412,45 @@ def is_transcode_required(context, stream_details, default=False):
     return default
 
 
+def get_transcode_decision(context, server, stream, transcode=False):
+    """
+    Choose direct play or a transcode bitrate from the measured throughput of the connection
+
+    :param context: context object
+    :param server: server object
+    :param stream: stream data, see StreamData
+    :param transcode: transcode decision from the transcode settings
+    :return: tuple (transcode, bitrate limit in kbps or None)
+    """
+    if not context.settings.transcode_auto() or stream['type'] != 'video':
+        return transcode, None
+
+    link_bitrate = server.get_link_bitrate()
+    if link_bitrate is None and context.settings.bandwidth_probe() and stream['parts']:
+        _ = server.probe_throughput(stream['parts'][0][0])
+        link_bitrate = server.get_link_bitrate()
+
+    if link_bitrate is None:
+        LOG.debug('Connection speed is unknown, using the transcode settings')
+        return transcode, None
+
+    try:
+        media_bitrate = float(stream['details'][0].get('bitrate', 0)) * 1000
+    except (IndexError, TypeError, ValueError):
+        media_bitrate = 0
+
+    if media_bitrate > link_bitrate:
+        LOG.debug('Media bitrate %dkbps exceeds the connection %dkbps, transcoding' %
+                  (media_bitrate, link_bitrate))
+        return True, link_bitrate
+
+    LOG.debug('Media bitrate %dkbps fits the connection %dkbps' % (media_bitrate, link_bitrate))
+    if transcode:
+        return True, link_bitrate
+
+    return False, None
+
+
 class StreamData:
 
     def __init__(self, context, server, tree):
@@ -401,6 +604,9 @@ class StreamData:
         return []
 
     def _get_lyrics(self):
+        """
+        Select the lyrics stream, the lyrics are fetched by play_library_media
+        """
         lyrics = []
 
         lyric_priorities = self.context.settings.get_lyrics_priorities()
@@ -424,7 +630,7 @@ class StreamData:
 
         if lyrics:
             lyrics = sorted(lyrics, key=lambda l: l['priority'], reverse=True)
-            return self.server.get_lyrics(lyrics[0]['id'])
+            self.data['extra']['lyrics_id'] = lyrics[0]['id']
 
         return ''
 
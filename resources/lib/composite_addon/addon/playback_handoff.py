@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2020 Composite (plugin.video.composite_for_plex)
+
+    This file is part of Composite (plugin.video.composite_for_plex)
+
+    SPDX-License-Identifier: GPL-2.0-or-later
+    See LICENSES/GPL-2.0-or-later.txt for more information.
+"""
+
+import base64
+import hashlib
+import json
+import time
+import zlib
+
+from six.moves import cPickle as pickle
+
+from .constants import CONFIG
+from .logger import Logger
+
+LOG = Logger('playback_handoff')
+
+# home window property holding the index of the published playback contexts
+INDEX_PROPERTY = '%s.playback_handoff' % CONFIG['id']
+# seconds before an unclaimed playback context is discarded
+MAX_AGE = 120
+
+
+def _key(playing_file):
+    if not isinstance(playing_file, bytes):
+        playing_file = playing_file.encode('utf-8')
+    return hashlib.sha1(playing_file).hexdigest()
+
+
+def _property(key):
+    return '%s.%s' % (INDEX_PROPERTY, key)
+
+
+def _read_index(window):
+    try:
+        return json.loads(window.getProperty(INDEX_PROPERTY) or '[]')
+    except ValueError:
+        return []
+
+
+def _write_index(window, index):
+    if index:
+        window.setProperty(INDEX_PROPERTY, json.dumps(index))
+    else:
+        window.clearProperty(INDEX_PROPERTY)
+
+
+def _expire(window, index):
+    current = []
+    for entry in index:
+        if time.time() - entry['time'] < MAX_AGE:
+            current.append(entry)
+        else:
+            LOG.debug('Discarding unclaimed playback context |%s|' % entry['key'])
+            window.clearProperty(_property(entry['key']))
+    return current
+
+
+def publish(window, playing_file, playback_dict):
+    """
+    Hand the playback context of a resolved url to the service, replaces the context
+    previously published for the same url
+
+    :param window: home window object
+    :param playing_file: the url passed to Kodi for playback
+    :param playback_dict: playback context, see PlaybackMonitorThread
+    """
+    key = _key(playing_file)
+    index = [entry for entry in _expire(window, _read_index(window)) if entry['key'] != key]
+    sequence = max([entry['sequence'] for entry in index] + [0]) + 1
+
+    data = base64.b64encode(zlib.compress(pickle.dumps(playback_dict, protocol=2)))
+    window.setProperty(_property(key), data.decode('ascii'))
+
+    # the context is set before it's listed, the service never sees a partial entry
+    index.append({'key': key, 'sequence': sequence, 'time': time.time()})
+    _write_index(window, index)
+
+    LOG.debug('Published playback context |%s| #%s, %s bytes' % (key, sequence, len(data)))
+
+
+def take(window, playing_file):
+    """
+    Claim the playback context of the playing url, or the most recently published
+    context when the playing url isn't known
+
+    :param window: home window object
+    :param playing_file: url reported by the player
+    :return: playback context dict or None
+    """
+    index = _expire(window, _read_index(window))
+    if not index:
+        _write_index(window, index)
+        return None
+
+    key = _key(playing_file) if playing_file else None
+    entries = [entry for entry in index if entry['key'] == key]
+    if not entries:
+        entries = sorted(index, key=lambda entry: entry['sequence'])[-1:]
+    entry = entries[0]
+
+    data = window.getProperty(_property(entry['key']))
+    window.clearProperty(_property(entry['key']))
+    _write_index(window, [item for item in index if item['key'] != entry['key']])
+
+    if not data:
+        return None
+
+    try:
+        playback_dict = pickle.loads(zlib.decompress(base64.b64decode(data)))
+    except Exception as error:  # pylint: disable=broad-except
+        LOG.debug('Unable to read playback context |%s| [%s]' % (entry['key'], error))
+        return None
+
+    LOG.debug('Claimed playback context |%s| #%s' % (entry['key'], entry['sequence']))
+    return playback_dict
@@ -10,6 +10,7 @@
 """
 
 import threading
+import time
 
 from kodi_six import xbmc  # pylint: disable=import-error
 
@@ -17,30 +18,102 @@ from .constants import CONFIG
 from .constants import StreamControl
 from .dialogs.skip_intro import SkipIntroDialog
 from .logger import Logger
+from .playback_handoff import take as take_playback_context
 from .strings import encode_utf8
 from .strings import i18n
+from .timeline_reporter import TimelineReporterThread
 from .up_next import UpNext
-from .utils import read_pickled
 
 LOG = Logger('player')
 
 
+class PlaybackEvents:
+    """
+    Player callback state of a playback monitor, the callbacks run on another thread
+    """
+    # seconds between abort checks while waiting for a player callback
+    ABORT_CHECK_INTERVAL = 1.0
+
+    def __init__(self, monitor):
+        self._monitor = monitor
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._changed = False
+        self.av_started = threading.Event()
+        self.paused = False
+
+    def event(self, event):
+        """
+        :param event: one of av_started, paused, resumed, seek
+        """
+        with self._lock:
+            if event == 'av_started':
+                self.av_started.set()
+            elif event == 'paused':
+                self.paused = True
+            elif event == 'resumed':
+                self.paused = False
+            self._changed = True
+
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def take_changed(self):
+        """
+        :return: True if an event was received since the last call
+        """
+        with self._lock:
+            changed = self._changed
+            self._changed = False
+        return changed
+
+    def wait(self, timeout):
+        """
+        Wait for a player callback, a stop or an abort request for up to timeout seconds
+        """
+        deadline = time.time() + timeout
+        while not self._wake.is_set() and not self._monitor.abortRequested():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            _ = self._wake.wait(min(remaining, self.ABORT_CHECK_INTERVAL))
+        self._wake.clear()
+
+
 class PlaybackMonitorThread(threading.Thread):
     LOG = Logger('PlaybackMonitorThread')
     MONITOR = xbmc.Monitor()
     PLAYER = xbmc.Player()
 
-    def __init__(self, settings, monitor_dict, window):
+    # poll intervals in seconds, dense polling is used around the intro markers,
+    # while resuming and until playback has started
+    POLL_DENSE = 0.5
+    POLL_SPARSE = 5.0
+    POLL_PAUSED = 30.0
+    # seconds before the intro start to switch to dense polling
+    INTRO_LOOKAHEAD = 2.0
+    # seconds between progress reports
+    REPORT_INTERVAL = 10.0
+
+    def __init__(self, settings, monitor_dict, window, reporter):
         super(PlaybackMonitorThread, self).__init__()  # pylint: disable=super-with-arguments
         self._stopped = threading.Event()
         self._ended = threading.Event()
 
         self.settings = settings
         self._window = window
+        self._reporter = reporter
 
         self._monitor_dict = monitor_dict
         self._dialog_skip_intro = None
 
+        # player callbacks wake the monitor instead of it polling the player state
+        self._events = PlaybackEvents(self.MONITOR)
+
+        self._api_calls = 0
+
         self.daemon = True
         self.start()
 
@@ -97,6 +170,7 @@ class PlaybackMonitorThread(threading.Thread):
     def stop(self):
         self.LOG.debug('[%s]: Stop event set...' % self.media_id())
         self._stopped.set()
+        self._events.wake()
 
     def stopped(self):
         return self._stopped.is_set()
@@ -108,18 +182,31 @@ class PlaybackMonitorThread(threading.Thread):
     def ended(self):
         return self._ended.is_set()
 
+    def playback_event(self, event):
+        """
+        Called from the player callbacks, wakes the monitor
+
+        :param event: one of av_started, paused, resumed, seek
+        """
+        self._events.event(event)
+
+    def _player(self, method, *args):
+        self._api_calls += 1
+        return getattr(self.PLAYER, method)(*args)
+
     def _wait_for_playback(self):
         np_wait_time = 0.5
         np_waited = 0.0
 
-        while not self.PLAYER.isPlaying() and not self.MONITOR.abortRequested():
+        while not self._player('isPlaying') and not self.MONITOR.abortRequested():
             self.LOG.debug('Waiting for playback to start')
 
-            xbmc.sleep(int(np_wait_time * 1000))
             if np_waited >= 5:
                 self.stop()
                 return
 
+            # returns as soon as onAVStarted is received
+            _ = self._events.av_started.wait(np_wait_time)
             np_waited += np_wait_time
 
     def notify_upnext(self):
@@ -145,30 +232,26 @@ class PlaybackMonitorThread(threading.Thread):
             if played_time == current_time:
                 self.LOG.debug('Video paused at: %s secs of %s @ %s%%' %
                                (current_time, total_time, progress))
-                self.server().report_playback_progress(self.media_id(),
-                                                       current_time * 1000,
-                                                       state='paused',
-                                                       duration=total_time * 1000)
+                self._reporter.report(self.server(), self.media_id(), current_time * 1000,
+                                      state='paused', duration=total_time * 1000)
             else:
                 self.LOG.debug('Video played time: %s secs of %s @ %s%%' %
                                (current_time, total_time, progress))
-                self.server().report_playback_progress(self.media_id(),
-                                                       current_time * 1000,
-                                                       state='playing',
-                                                       duration=total_time * 1000)
+                self._reporter.report(self.server(), self.media_id(), current_time * 1000,
+                                      state='playing', duration=total_time * 1000)
                 played_time = current_time
         else:
             self.LOG.debug('Playback Stopped: %s secs of %s @ %s%%' %
                            (current_time, total_time, progress))
             # report_playback_progress state=stopped will adjust current time to match duration
             # and mark media as watched if progress >= 98%
-            self.server().report_playback_progress(self.media_id(), current_time * 1000,
-                                                   state='stopped', duration=total_time * 1000)
+            self._reporter.report(self.server(), self.media_id(), current_time * 1000,
+                                  state='stopped', duration=total_time * 1000)
         return played_time
 
     def _is_playing_current_file(self):
         try:
-            current_file = self.PLAYER.getPlayingFile()
+            current_file = self._player('getPlayingFile')
             if current_file != self.playing_file() and \
                     not (current_file.startswith(self.plugin_path())
                          and self.media_id() in current_file) or self.stopped():
@@ -178,18 +261,11 @@ class PlaybackMonitorThread(threading.Thread):
             pass
         return True
 
-    def _get_time_ms(self):
-        try:
-            current_time = self.PLAYER.getTime()
-        except RuntimeError:
-            current_time = 0.0
-        return 1000 * current_time
-
     def _get_playback_progress(self, total_time):
         try:
-            current_time = int(self.PLAYER.getTime())
+            current_time = int(self._player('getTime'))
             if total_time == 0:
-                total_time = int(self.PLAYER.getTotalTime())
+                total_time = int(self._player('getTotalTime'))
         except RuntimeError:
             current_time = 0
 
@@ -222,24 +298,74 @@ class PlaybackMonitorThread(threading.Thread):
                                                   CONFIG['addon'].getAddonInfo('path'),
                                                   'default', '720p', intro_end=self._intro_end())
 
-    def skip_intro(self):
-        if (self.settings.intro_skipping() and
-                self._intro_start() is not None and self._intro_end() is not None):
+    def _use_intro_skipping(self):
+        return (self.settings.intro_skipping() and
+                self._intro_start() is not None and self._intro_end() is not None)
+
+    def skip_intro(self, time_ms):
+        if self._use_intro_skipping():
             if (self._dialog_skip_intro and self._dialog_skip_intro.on_hold and
-                    (self._intro_start() > self._get_time_ms() or
-                     self._get_time_ms() > self._intro_end())):
+                    (self._intro_start() > time_ms or time_ms > self._intro_end())):
                 self._dialog_skip_intro.on_hold = False
 
-            if self._intro_start() <= self._get_time_ms() < self._intro_end():
+            if self._intro_start() <= time_ms < self._intro_end():
                 self._skip_intro_dialog()
                 self._dialog_skip_intro.show()
 
-            elif self._dialog_skip_intro and self._get_time_ms() >= self._intro_end():
+            elif self._dialog_skip_intro and time_ms >= self._intro_end():
                 self._dialog_skip_intro.close()
 
-            elif self._dialog_skip_intro and self._get_time_ms() < self._intro_start():
+            elif self._dialog_skip_intro and time_ms < self._intro_start():
                 self._dialog_skip_intro.close()
 
+    def _poll_interval(self, current_time, until_report, dense):
+        """
+        :param current_time: playback time in seconds
+        :param until_report: seconds until the next progress report
+        :param dense: poll densely regardless of the playback position
+        :return: seconds to wait before polling the player again
+        """
+        if self._events.paused:
+            return self.POLL_PAUSED  # resuming wakes the monitor
+
+        if dense or current_time <= 0:
+            return self.POLL_DENSE
+
+        interval = min(self.POLL_SPARSE, max(until_report, self.POLL_DENSE))
+
+        if self._use_intro_skipping():
+            intro_start = self._intro_start() / 1000.0 - self.INTRO_LOOKAHEAD
+            intro_end = self._intro_end() / 1000.0
+            if intro_start <= current_time < intro_end:
+                return self.POLL_DENSE
+            if current_time < intro_start:
+                interval = min(interval, max(intro_start - current_time, self.POLL_DENSE))
+
+        if self._dialog_skip_intro and self._dialog_skip_intro.showing:
+            return self.POLL_DENSE
+
+        return interval
+
+    def _add_lyrics(self):
+        """
+        Add the lyrics that weren't fetched before playback started
+        """
+        lyrics_id = self.stream().get('extra', {}).get('lyrics_id')
+        if not lyrics_id or self.stopped():
+            return
+
+        lyrics = self.server().get_lyrics(lyrics_id)
+        if not lyrics:
+            return
+
+        try:
+            list_item = self.PLAYER.getPlayingItem()
+            list_item.setInfo('music', {'lyrics': lyrics})
+            self.PLAYER.updateInfoTag(list_item)
+            self.LOG.debug('[%s]: lyrics added' % self.media_id())
+        except (AttributeError, RuntimeError):  # getPlayingItem requires Kodi 18
+            pass
+
     def run(self):
         current_time = 0
         played_time = 0
@@ -253,30 +379,28 @@ class PlaybackMonitorThread(threading.Thread):
 
         if self.stream():
             set_audio_subtitles(self.settings, self.stream())
+            self._add_lyrics()
 
-        wait_time = 0.5
-        waited = 0.0
+        started = time.time()
+        last_report = started
 
         notified_upnext = False
         resumed = not self.details().get('resuming')
 
         # Whilst the file is playing back
-        while self.PLAYER.isPlaying() and not self.MONITOR.abortRequested():
+        while self._player('isPlaying') and not self.MONITOR.abortRequested():
 
             if not self._is_playing_current_file():
                 break
 
             current_time, total_time, progress = self._get_playback_progress(total_time)
 
-            self.skip_intro()
+            self.skip_intro(current_time * 1000)
 
-            try:
-                report = int((float(waited) / 10.0)) >= 1
-            except ZeroDivisionError:
-                report = False
-
-            if report:  # only report every ~10 seconds, times are updated at 0.5 seconds
-                waited = 0.0
+            # report every ~10 seconds, and right away when playback was paused or resumed
+            changed = self._events.take_changed()
+            if changed or time.time() - last_report >= self.REPORT_INTERVAL:
+                last_report = time.time()
                 played_time = self.report_playback_progress(current_time, total_time,
                                                             progress, played_time)
 
@@ -288,13 +412,16 @@ class PlaybackMonitorThread(threading.Thread):
                     notified_upnext = True
                     self.notify_upnext()
 
-            if self.MONITOR.waitForAbort(wait_time):
-                break
-
-            waited += wait_time
+            until_report = self.REPORT_INTERVAL - (time.time() - last_report)
+            self._events.wait(self._poll_interval(current_time, until_report, not resumed))
 
         _ = self.report_playback_progress(current_time, total_time, progress)
 
+        elapsed = max(time.time() - started, 1.0)
+        self.LOG.debug('[%s]: %s player calls in %.0f seconds (%.0f per hour)' %
+                       (self.media_id(), self._api_calls, elapsed,
+                        self._api_calls * 3600.0 / elapsed))
+
         if self._dialog_skip_intro and self._dialog_skip_intro.showing:
             self._dialog_skip_intro.close()
 
@@ -314,6 +441,9 @@ class CallbackPlayer(xbmc.Player):
         self.threads = []
         self.window = window
 
+        # timeline reports are sent from one thread, playback monitoring never waits on them
+        self.timeline_reporter = TimelineReporterThread()
+
     def stop_threads(self):
         for thread in self.threads:
             if thread.ended():
@@ -355,11 +485,16 @@ class CallbackPlayer(xbmc.Player):
 
     def onPlayBackStarted(self):  # pylint: disable=invalid-name
         monitor_playback = not self.settings.playback_monitor_disabled(fresh=True)
-        playback_dict = read_pickled('playback_monitor.pickle')
+        try:
+            playing_file = self.getPlayingFile()
+        except RuntimeError:
+            playing_file = None
+        playback_dict = take_playback_context(self.window, playing_file)
 
         self.cleanup_threads()
         if monitor_playback and playback_dict:
-            self.threads.append(PlaybackMonitorThread(self.settings, playback_dict, self.window))
+            self.threads.append(PlaybackMonitorThread(self.settings, playback_dict, self.window,
+                                                      self.timeline_reporter))
 
         elif not monitor_playback:
             self.LOG('Playback monitoring is disabled ...')
@@ -367,6 +502,24 @@ class CallbackPlayer(xbmc.Player):
         elif not playback_dict:
             self.LOG('Playback monitoring failed to start, missing required {} ...')
 
+    def _playback_event(self, event):
+        for thread in self.threads:
+            if not thread.ended():
+                thread.playback_event(event)
+
+    def onAVStarted(self):  # pylint: disable=invalid-name
+        self._playback_event('av_started')
+
+    def onPlayBackPaused(self):  # pylint: disable=invalid-name
+        self._playback_event('paused')
+
+    def onPlayBackResumed(self):  # pylint: disable=invalid-name
+        self._playback_event('resumed')
+
+    # pylint: disable=invalid-name, unused-argument
+    def onPlayBackSeek(self, seek_time, seek_offset):
+        self._playback_event('seek')
+
     def onPlayBackEnded(self):  # pylint: disable=invalid-name
         self.stop_threads()
         self.cleanup_threads()
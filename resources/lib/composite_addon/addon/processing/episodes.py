@@ -21,6 +21,41 @@ from ..utils import get_xml
 LOG = Logger()
 
 
+def create_episode_items(context, server, url, tree, library=False):
+    """
+    Create the items of an episode listing, used by process_episodes and the widget listings
+
+    :return: list of items
+    """
+    items = []
+    append_item = items.append
+    episodes = tree.getiterator('Video')
+    for episode in episodes:
+        item = Item(server, url, tree, episode)
+        append_item(create_episode_item(context, item, library=library))
+    return items
+
+
+def get_sort_methods(context, tree):
+    """
+    :return: list of the sort methods of an episode listing
+    """
+    if tree.get('mixedParents') == '1' or context.settings.episode_sort_method() == 'plex':
+        sort_methods = [xbmcplugin.SORT_METHOD_UNSORTED]
+    else:
+        sort_methods = [xbmcplugin.SORT_METHOD_EPISODE, xbmcplugin.SORT_METHOD_UNSORTED]
+
+    return sort_methods + [
+        xbmcplugin.SORT_METHOD_DATE,
+        xbmcplugin.SORT_METHOD_VIDEO_SORT_TITLE_IGNORE_THE,
+        xbmcplugin.SORT_METHOD_DATEADDED,
+        xbmcplugin.SORT_METHOD_VIDEO_RATING,
+        xbmcplugin.SORT_METHOD_VIDEO_YEAR,
+        xbmcplugin.SORT_METHOD_VIDEO_RUNTIME,
+        xbmcplugin.SORT_METHOD_MPAA_RATING,
+    ]
+
+
 def process_episodes(context, url, tree=None, rating_key=None, library=False):
     xbmcplugin.setContent(get_handle(), 'episodes')
 
@@ -36,26 +71,10 @@ def process_episodes(context, url, tree=None, rating_key=None, library=False):
     if tree is None:
         return
 
-    if tree.get('mixedParents') == '1' or context.settings.episode_sort_method() == 'plex':
-        xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_UNSORTED)
-    else:
-        xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_EPISODE)
-        xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_UNSORTED)
-
-    xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_DATE)
-    xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_VIDEO_SORT_TITLE_IGNORE_THE)
-    xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_DATEADDED)
-    xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_VIDEO_RATING)
-    xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_VIDEO_YEAR)
-    xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_VIDEO_RUNTIME)
-    xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_MPAA_RATING)
+    for sort_method in get_sort_methods(context, tree):
+        xbmcplugin.addSortMethod(get_handle(), sort_method)
 
-    items = []
-    append_item = items.append
-    episodes = tree.getiterator('Video')
-    for episode in episodes:
-        item = Item(server, url, tree, episode)
-        append_item(create_episode_item(context, item, library=library))
+    items = create_episode_items(context, server, url, tree, library=library)
 
     if items:
         xbmcplugin.addDirectoryItems(get_handle(), items, len(items))
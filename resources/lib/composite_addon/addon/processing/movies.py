@@ -25,21 +25,18 @@ from ..utils import get_xml
 LOG = Logger()
 
 
-def process_movies(context, url, tree=None):
-    # get the server name from the URL, which was passed via the on screen listing..
-    server = context.plex_network.get_server_from_url(url)
-
-    tree = get_xml(context, url, tree)
-    if tree is None:
-        return
+def create_movie_items(context, server, url, tree):
+    """
+    Create the items of a movie listing, used by process_movies and the widget listings
 
+    :return: tuple (content type, items)
+    """
     content_counter = {
         'photo': 0,
         'track': 0,
         'video': 0,
     }
     # Find all the video tags, as they contain the data we need to link to a file.
-    start_time = time.time()
     items = []
     append_item = items.append
     branches = tree.getiterator()
@@ -52,26 +49,54 @@ def process_movies(context, url, tree=None):
         elif branch.tag.lower() == 'photo':  # mixed content video playlist
             append_item(create_photo_item(context, item))
 
+    content_type = 'movies'
+    if context.settings.mixed_content_type() == 'majority':
+        majority = max(content_counter, key=content_counter.get)
+        if majority == 'photo':
+            content_type = 'images'
+        elif majority == 'track':
+            content_type = 'songs'
+
+    return content_type, items
+
+
+def get_sort_methods(url, content_type):
+    """
+    :return: list of the sort methods of a movie listing
+    """
+    sort_methods = []
+    if content_type == 'movies' and '/collection/' in url:
+        sort_methods.append(xbmcplugin.SORT_METHOD_VIDEO_YEAR)
+    sort_methods += [
+        xbmcplugin.SORT_METHOD_UNSORTED,
+        xbmcplugin.SORT_METHOD_VIDEO_SORT_TITLE_IGNORE_THE,
+        xbmcplugin.SORT_METHOD_DATEADDED,
+        xbmcplugin.SORT_METHOD_DATE,
+        xbmcplugin.SORT_METHOD_VIDEO_RATING,
+    ]
+    if content_type != 'movies' and '/collection/' not in url:
+        sort_methods.append(xbmcplugin.SORT_METHOD_VIDEO_YEAR)
+    sort_methods += [
+        xbmcplugin.SORT_METHOD_VIDEO_RUNTIME,
+        xbmcplugin.SORT_METHOD_MPAA_RATING,
+    ]
+    return sort_methods
+
+
+def process_movies(context, url, tree=None):
+    # get the server name from the URL, which was passed via the on screen listing..
+    server = context.plex_network.get_server_from_url(url)
+
+    tree = get_xml(context, url, tree)
+    if tree is None:
+        return
+
+    start_time = time.time()
+    content_type, items = create_movie_items(context, server, url, tree)
+
     if items:
-        content_type = 'movies'
-        if context.settings.mixed_content_type() == 'majority':
-            majority = max(content_counter, key=content_counter.get)
-            if majority == 'photo':
-                content_type = 'images'
-            elif majority == 'track':
-                content_type = 'songs'
-
-        if content_type == 'movies' and '/collection/' in url:
-            xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_VIDEO_YEAR)
-        xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_UNSORTED)
-        xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_VIDEO_SORT_TITLE_IGNORE_THE)
-        xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_DATEADDED)
-        xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_DATE)
-        xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_VIDEO_RATING)
-        if content_type != 'movies' and '/collection/' not in url:
-            xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_VIDEO_YEAR)
-        xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_VIDEO_RUNTIME)
-        xbmcplugin.addSortMethod(get_handle(), xbmcplugin.SORT_METHOD_MPAA_RATING)
+        for sort_method in get_sort_methods(url, content_type):
+            xbmcplugin.addSortMethod(get_handle(), sort_method)
         xbmcplugin.setContent(get_handle(), content_type)
         xbmcplugin.addDirectoryItems(get_handle(), items, len(items))
 
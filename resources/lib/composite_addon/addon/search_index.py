@@ -0,0 +1,519 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2020 Composite (plugin.video.composite_for_plex)
+
+    This file is part of Composite (plugin.video.composite_for_plex)
+
+    SPDX-License-Identifier: GPL-2.0-or-later
+    See LICENSES/GPL-2.0-or-later.txt for more information.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+import xml.etree.ElementTree as ETree
+
+from six import text_type
+
+from .cache_control import CacheControl
+from .constants import WATCH_STATE_ATTRIBUTES
+from .logger import Logger
+
+LOG = Logger('search_index')
+
+# seconds between incremental updates of the search index by the service
+UPDATE_INTERVAL = 900
+
+# bump when SectionIndex changes, older section indexes are rebuilt
+INDEX_VERSION = 3
+
+# full listings of a section between incremental updates, an item count can't tell
+# a removed item from one replaced by a new item
+REBUILD_INTERVAL = 24 * 3600
+
+# rating keys per request for the watch state of search results
+WATCH_STATE_BATCH = 50
+
+# item types indexed per section type, see routes/search_all_servers.get_item_type
+SECTION_ITEM_TYPES = {
+    'movie': (1,),
+    'show': (2, 4),
+    'artist': (8, 9, 10),
+}
+
+# attributes of the indexed elements that are searched
+SEARCH_ATTRIBUTES = ('title', 'originalTitle', 'titleSort', 'grandparentTitle', 'year')
+
+NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+# legacy agent guids ie. com.plexapp.agents.imdb://tt0111161?lang=en
+LEGACY_GUID_RE = re.compile(r'^com\.plexapp\.agents\.(?P<agent>[^:]+)://'
+                            r'(?P<id>[^/?]+)(?P<path>/[^?]*)?')
+LEGACY_AGENTS = {
+    'imdb': 'imdb',
+    'themoviedb': 'tmdb',
+    'thetvdb': 'tvdb',
+}
+
+SEARCH_CACHE = CacheControl('search')
+
+
+def normalize(text):
+    """
+    :param text: text to normalize
+    :return: list of lower case tokens without diacritics or punctuation
+    """
+    if not text:
+        return []
+
+    if not isinstance(text, text_type):
+        text = text.decode('utf-8', 'ignore')
+
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(character for character in text if not unicodedata.combining(character))
+    return [token for token in NON_WORD_RE.split(text.lower()) if token]
+
+
+def trigrams(token):
+    return set(token[idx:idx + 3] for idx in range(len(token) - 2))
+
+
+def external_ids(element):
+    """
+    :param element: item element from a section listing requested with includeGuids
+    :return: list of tuples (source, id) ie. ('imdb', 'tt0111161'), ('tmdb', '278')
+    """
+    ids = []
+
+    for guid in element.findall('Guid'):
+        source, _, external_id = guid.get('id', '').partition('://')
+        if source and external_id:
+            ids.append((source, external_id))
+
+    match = LEGACY_GUID_RE.match(element.get('guid', ''))
+    # episode guids of legacy tv agents hold the show id followed by /season/episode
+    if match and match.group('agent') in LEGACY_AGENTS and not match.group('path'):
+        ids.append((LEGACY_AGENTS[match.group('agent')], match.group('id')))
+
+    return ids
+
+
+class SectionIndex:
+    """
+    Token and trigram postings for the items of one library section,
+    and external ids and show/season/episode numbers mapped to rating keys
+    The stored elements don't carry the watch state, see WATCH_STATE_ATTRIBUTES
+    """
+
+    def __init__(self, revision):
+        self.version = INDEX_VERSION
+        self.revision = revision
+        self.built = time.time()  # time of the last full listing
+        self.updated_at = 0  # updatedAt high-water mark of the indexed items
+        self.container = {}  # attributes of the listing MediaContainer
+        self.documents = {}  # rating key -> (item type, tokens, serialized element)
+        self.tokens = {}  # token -> rating keys
+        self.trigrams = {}  # trigram -> tokens
+        self.external_ids = {}  # (source, id) -> rating key
+        # (show rating key, season) -> season rating key
+        # (show rating key, season, episode) -> episode rating key
+        self.numbers = {}
+
+    @staticmethod
+    def _numbers(element):
+        if element.get('type') != 'episode' or not element.get('grandparentRatingKey'):
+            return []
+
+        show = element.get('grandparentRatingKey')
+        season = element.get('parentIndex')
+        numbers = [((show, season, element.get('index')), element.get('ratingKey'))]
+        if element.get('parentRatingKey'):
+            numbers.append(((show, season), element.get('parentRatingKey')))
+        return numbers
+
+    def add(self, item_type, element):
+        rating_key = element.get('ratingKey')
+        if not rating_key:
+            return
+
+        self.remove(rating_key)
+
+        try:
+            self.updated_at = max(self.updated_at, int(element.get('updatedAt', 0)))
+        except ValueError:
+            pass
+
+        for attribute in WATCH_STATE_ATTRIBUTES:
+            element.attrib.pop(attribute, None)
+
+        tokens = []
+        for attribute in SEARCH_ATTRIBUTES:
+            tokens += normalize(element.get(attribute))
+        tokens = frozenset(tokens)
+
+        self.documents[rating_key] = (item_type, tokens, ETree.tostring(element))
+        for token in tokens:
+            self.tokens.setdefault(token, set()).add(rating_key)
+            for trigram in trigrams(token):
+                self.trigrams.setdefault(trigram, set()).add(token)
+
+        for external_id in external_ids(element):
+            self.external_ids.setdefault(external_id, rating_key)
+
+        for key, value in self._numbers(element):
+            self.numbers[key] = value
+
+    def remove(self, rating_key):
+        """
+        Remove an item, its tokens are kept in the trigram postings until the next full listing
+        """
+        document = self.documents.pop(rating_key, None)
+        if document is None:
+            return
+
+        _, tokens, element = document
+        for token in tokens:
+            postings = self.tokens.get(token)
+            if postings is None:
+                continue
+            postings.discard(rating_key)
+            if not postings:
+                del self.tokens[token]
+
+        element = ETree.fromstring(element)
+        for external_id in external_ids(element):
+            if self.external_ids.get(external_id) == rating_key:
+                del self.external_ids[external_id]
+
+        for key, _ in self._numbers(element):
+            if self.numbers.get(key) == rating_key:  # seasons stay with their other episodes
+                del self.numbers[key]
+
+    def count(self, item_type):
+        return len([document for document in self.documents.values()
+                    if document[0] == item_type])
+
+    def find(self, ids, season=None, episode=None):
+        """
+        :param ids: list of tuples (source, id) of the requested item, or of its show
+        :param season: season number, for seasons and episodes
+        :param episode: episode number, for episodes
+        :return: rating key or None
+        """
+        for external_id in ids:
+            rating_key = self.external_ids.get(external_id)
+            if rating_key is None:
+                continue
+
+            if season is None:
+                return rating_key
+
+            item_type = self.documents.get(rating_key, (None,))[0]
+            if episode is not None and item_type == 4:
+                return rating_key  # the ids belong to the episode
+
+            if item_type != 2:
+                continue
+
+            if episode is None:
+                rating_key = self.numbers.get((rating_key, season))
+            else:
+                rating_key = self.numbers.get((rating_key, season, episode))
+
+            if rating_key is not None:
+                return rating_key
+
+        return None
+
+    def _matching_keys(self, query_token):
+        if len(query_token) < 3:
+            tokens = [token for token in self.tokens if token.startswith(query_token)]
+        else:
+            candidates = None
+            for trigram in trigrams(query_token):
+                postings = self.trigrams.get(trigram, set())
+                candidates = postings if candidates is None else candidates & postings
+                if not candidates:
+                    return set()
+            tokens = [token for token in candidates if query_token in token]
+
+        keys = set()
+        for token in tokens:
+            keys |= self.tokens.get(token, set())
+        return keys
+
+    def search(self, query, item_type):
+        """
+        :param query: search text
+        :param item_type: plex item type to return
+        :return: list of elements matching all query tokens, exact token matches first
+        """
+        query_tokens = normalize(query)
+        if not query_tokens:
+            return []
+
+        keys = None
+        for query_token in query_tokens:
+            matches = self._matching_keys(query_token)
+            keys = matches if keys is None else keys & matches
+            if not keys:
+                return []
+
+        results = []
+        for rating_key in keys:
+            document_type, tokens, element = self.documents[rating_key]
+            if document_type != item_type:
+                continue
+            exact = len([token for token in query_tokens if token in tokens])
+            results.append((-exact, rating_key, element))
+
+        return [ETree.fromstring(element) for _, _, element in sorted(results)]
+
+    def get_container(self):
+        return ETree.Element('MediaContainer', self.container)
+
+
+class SearchIndex:
+    """
+    Persistent search index of all library sections, one cache file per section
+    Sections are rebuilt when their revision changes, unindexed sections return None
+    so the caller can fall back to the server search
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else SEARCH_CACHE
+        self._sections = {}
+
+    @staticmethod
+    def cache_name(server_uuid, section):
+        return 'search_%s_%s.cache' % (server_uuid, section)
+
+    def get_section(self, server_uuid, section):
+        key = (server_uuid, str(section))
+        if key not in self._sections:
+            _, section_index = self.cache.read_cache(self.cache_name(server_uuid, section))
+            if getattr(section_index, 'version', None) != INDEX_VERSION:
+                section_index = None
+            self._sections[key] = section_index
+        return self._sections[key]
+
+    def search(self, server, section, query, item_type):
+        """
+        :param server: server object
+        :param section: section key
+        :param query: search text
+        :param item_type: plex item type to return
+        :return: tuple (container, elements) or None if the section isn't indexed or
+                 the index is outdated
+        """
+        section_index = self._current_section(server, section)
+        if section_index is None:
+            return None
+
+        elements = section_index.search(query, item_type)
+        self._set_watch_state(server, elements)
+        return section_index.get_container(), elements
+
+    @staticmethod
+    def _set_watch_state(server, elements):
+        """
+        Add the current watch state to indexed elements, elements whose metadata can't be
+        requested are listed without it
+
+        :param server: server object
+        :param elements: elements from SectionIndex.search
+        """
+        for idx in range(0, len(elements), WATCH_STATE_BATCH):
+            batch = dict((element.get('ratingKey'), element)
+                         for element in elements[idx:idx + WATCH_STATE_BATCH])
+            tree = server.get_metadata(','.join(batch.keys()))
+            if tree is None:
+                continue
+
+            for current in tree:
+                element = batch.get(current.get('ratingKey'))
+                if element is None:
+                    continue
+                for attribute in WATCH_STATE_ATTRIBUTES:
+                    if current.get(attribute) is not None:
+                        element.set(attribute, current.get(attribute))
+
+    def find(self, server, section, ids, season=None, episode=None):
+        """
+        Find an item by its external ids, see SectionIndex.find
+
+        :param server: server object
+        :param section: section key
+        :return: rating key, or None if the item isn't found, the section isn't indexed
+                 or the index is outdated
+        """
+        section_index = self._current_section(server, section)
+        if section_index is None:
+            return None
+
+        return section_index.find(ids, season, episode)
+
+    def find_episode(self, server, section, show, season, episode):
+        """
+        Find an episode by its show, season and episode number
+
+        :param server: server object
+        :param section: section key
+        :param show: rating key of the show
+        :param season: season number
+        :param episode: episode number
+        :return: rating key, or None if the episode isn't found, the section isn't indexed
+                 or the index is outdated
+        """
+        section_index = self._current_section(server, section)
+        if section_index is None:
+            return None
+
+        return section_index.numbers.get((str(show), str(season), str(episode)))
+
+    def _current_section(self, server, section):
+        section_index = self.get_section(server.get_uuid(), section)
+        if section_index is None:
+            return None
+
+        revision = server.get_section_revisions().get(str(section))
+        if not revision or revision != section_index.revision:
+            LOG.debug('Search index for %s/%s is outdated' % (server.get_uuid(), section))
+            return None
+
+        return section_index
+
+    def update(self, server, section, section_type):
+        """
+        Update the index of a section if its revision changed, with the items changed
+        since the last update, the section is listed in full for the first update,
+        when the item count differs and every REBUILD_INTERVAL
+
+        :param server: server object
+        :param section: section key
+        :param section_type: section type ie. movie, show, artist
+        :return: True if the section was updated
+        """
+        item_types = SECTION_ITEM_TYPES.get(section_type)
+        if not item_types:
+            return False
+
+        revision = server.get_section_revisions().get(str(section))
+        if not revision:
+            return False
+
+        section_index = self.get_section(server.get_uuid(), section)
+        if section_index is not None and section_index.revision == revision:
+            return False
+
+        start_time = time.time()
+        updated = None
+        if section_index is not None and time.time() - section_index.built < REBUILD_INTERVAL:
+            updated = self._update_changes(server, section, section_index, item_types)
+
+        if updated is None:
+            section_index = self._build(server, section, revision, item_types)
+            if section_index is None:
+                return False
+            updated = len(section_index.documents)
+
+        section_index.revision = revision
+        self.cache.write_cache(self.cache_name(server.get_uuid(), section), section_index)
+        self._sections[(server.get_uuid(), str(section))] = section_index
+        LOG.debug('Indexed %s items of %s/%s in %.2fs' %
+                  (updated, server.get_uuid(), section, time.time() - start_time))
+        return True
+
+    @staticmethod
+    def _build(server, section, revision, item_types):
+        """
+        :return: SectionIndex with all items of the section, or None if a request failed
+        """
+        section_index = SectionIndex(revision)
+        for item_type in item_types:
+            tree = server.get_section_listing(section, item_type)
+            if tree is None:
+                return None
+            section_index.container = dict(tree.attrib)
+            for element in tree:
+                section_index.add(item_type, element)
+        return section_index
+
+    @staticmethod
+    def _update_changes(server, section, section_index, item_types):
+        """
+        :return: number of changed items, or None if the section has to be listed in full
+        """
+        updated_since = section_index.updated_at
+        changed = 0
+        for item_type in item_types:
+            tree = server.get_section_changes(section, updated_since, item_type, True)
+            if tree is None:
+                return None
+            for element in tree:
+                section_index.add(item_type, element)
+            changed += len(tree)
+
+            if server.get_section_size(section, item_type) != section_index.count(item_type):
+                LOG.debug('Item count of %s/%s changed' % (server.get_uuid(), section))
+                return None
+        return changed
+
+    def update_all(self, plex_network, stopped=None):
+        """
+        :param plex_network: plex network object
+        :param stopped: callable, returns True when the update should stop
+        """
+        for server in plex_network.get_server_list():
+            if server.is_offline():
+                continue
+
+            for section in server.get_sections():
+                if stopped is not None and stopped():
+                    return
+                try:
+                    self.update(server, section.get_key(), section.get_type())
+                except Exception as error:  # pylint: disable=broad-except
+                    LOG.debug('Unable to index %s/%s [%s]' %
+                              (server.get_uuid(), section.get_key(), error))
+
+
+class SearchIndexThread(threading.Thread):
+    """
+    Update the search index once, used by the service
+    """
+    LOG = Logger('SearchIndexThread')
+
+    def __init__(self, plex_network):
+        super(SearchIndexThread, self).__init__()  # pylint: disable=super-with-arguments
+        self._stopped = threading.Event()
+        self._ended = threading.Event()
+
+        self.plex_network = plex_network
+
+        self.daemon = True
+        self.start()
+
+    def stop(self):
+        self.LOG.debug('Stop event set...')
+        self._stopped.set()
+
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def end(self):
+        self.LOG.debug('End event set...')
+        self._ended.set()
+
+    def ended(self):
+        return self._ended.is_set()
+
+    def run(self):
+        try:
+            SearchIndex().update_all(self.plex_network, self.stopped)
+        except Exception as error:  # pylint: disable=broad-except
+            self.LOG.error('Search index update failed [%s]' % error)
+
+        self.end()
@@ -146,6 +146,15 @@ class AddonSettings:  # pylint: disable=too-many-public-methods
     def recently_added_include_watched(self):
         return self._get_setting('ra_sections_include_watched')
 
+    def all_servers_item_count(self):
+        return int(self._get_setting('all_servers_item_count'))
+
+    def search_index(self):
+        return self._get_setting('search_index', fresh=True)
+
+    def per_server_hubs(self):
+        return self._get_setting('per_server_hubs')
+
     def flatten_seasons(self):
         return self._get_setting('flatten')
 
@@ -263,6 +272,12 @@ class AddonSettings:  # pylint: disable=too-many-public-methods
     def transcode_g8bit(self):
         return self._get_setting('transcode_g8bit')
 
+    def transcode_auto(self):
+        return self._get_setting('transcode_auto')
+
+    def bandwidth_probe(self):
+        return self._get_setting('bandwidth_probe')
+
     def transcode_profile(self, value):
         try:
             value = int(value)
@@ -327,6 +342,14 @@ class AddonSettings:  # pylint: disable=too-many-public-methods
     def data_cache_ttl(self):
         return int(self._get_setting('data_cache_ttl', fresh=True)) * 60
 
+    def server_notifications(self):
+        return self._get_setting('data_cache', fresh=True) and \
+            self._get_setting('server_notifications', fresh=True)
+
+    def background_widgets(self):
+        return self._get_setting('data_cache', fresh=True) and \
+            self._get_setting('background_widgets', fresh=True)
+
     def use_companion(self):
         return self._get_setting('use_companion_receiver', fresh=True)
 
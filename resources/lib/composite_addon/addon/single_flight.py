@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2020 Composite (plugin.video.composite_for_plex)
+
+    This file is part of Composite (plugin.video.composite_for_plex)
+
+    SPDX-License-Identifier: GPL-2.0-or-later
+    See LICENSES/GPL-2.0-or-later.txt for more information.
+"""
+
+import threading
+import time
+
+from kodi_six import xbmc  # pylint: disable=import-error
+from kodi_six import xbmcgui  # pylint: disable=import-error
+
+from .constants import CONFIG
+from .logger import Logger
+
+LOG = Logger('single_flight')
+
+
+class _Call:
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+    def done(self):
+        self.event.set()
+
+    def wait(self):
+        """
+        :return: result of the call, raises the error of the call
+        """
+        self.event.wait()
+        if self.error is not None:
+            raise self.error  # pylint: disable=raising-bad-type
+        return self.result
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key within a process,
+    callers wait for the in-flight call and share its result
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            LOG.debug('Waiting for in-flight call |%s|' % str(key))
+            return call.wait()
+
+        try:
+            call.result = function(*args, **kwargs)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done()
+
+        return call.result
+
+
+class ProcessLease:
+    """
+    In-flight marker shared by all add-on processes, stored as a home window property
+    Other processes wait for the lease to be released and then read the result from cache
+    """
+
+    def __init__(self, name, timeout=30):
+        self.window = xbmcgui.Window(10000)
+        self.property = '%s.in_flight.%s' % (CONFIG['id'], name)
+        self.timeout = timeout
+        self.acquired = False
+
+    def _held(self):
+        value = self.window.getProperty(self.property)
+        if not value:
+            return False
+
+        try:
+            return time.time() - float(value) < self.timeout
+        except ValueError:
+            return False
+
+    def acquire(self):
+        if self._held():
+            return False
+
+        self.window.setProperty(self.property, str(time.time()))
+        self.acquired = True
+        return True
+
+    def release(self):
+        if self.acquired:
+            self.window.clearProperty(self.property)
+            self.acquired = False
+
+    def wait(self, interval=0.1):
+        """
+        Wait for the lease to be released by the process holding it
+
+        :param interval: seconds between checks
+        :return: True when the lease was released or timed out, False on abort
+        """
+        monitor = xbmc.Monitor()
+        while self._held():
+            if monitor.waitForAbort(interval):
+                return False
+        return True
+
+
+SINGLE_FLIGHT = SingleFlight()
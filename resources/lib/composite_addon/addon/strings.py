@@ -221,6 +221,36 @@ STRINGS = {
     'Configured library sections have been reset': 30799,
 }
 
+# translatable directory titles, matched by the suffix of the directory thumb
+DIRECTORY_TRANSLATIONS = (
+    (('show.png',), frozenset([
+        'All Shows', 'Unplayed', 'Unwatched', 'Recently Aired', 'Recently Added',
+        'Recently Viewed Episodes', 'Recently Viewed Shows', 'On Deck', 'By Collection',
+        'By First Letter', 'By Genre', 'By Year', 'By Content Rating', 'By Folder',
+        'Search Shows...', 'Search Episodes...',
+    ])),
+    (('artist.png',), frozenset([
+        'All Artists', 'By Album', 'By Genre', 'By Year', 'By Collection', 'Recently Added',
+        'By Folder', 'Search Artists...', 'Search Albums...', 'Search Tracks...',
+    ])),
+    (('movie.png', 'video.png'), frozenset([
+        'All Movies', 'Unplayed', 'Unwatched', 'Recently Released', 'Recently Added',
+        'Recently Viewed', 'On Deck', 'By Collection', 'By Genre', 'By Year', 'By Decade',
+        'By Director', 'By Starring Actor', 'By Country', 'By Content Rating', 'By Rating',
+        'By Resolution', 'By First Letter', 'By Folder', 'Search...',
+    ])),
+    (('photo.png',), frozenset([
+        'All Photos', 'By Year', 'Recently Added', 'Camera Make', 'Camera Model', 'Aperture',
+        'Shutter Speed', 'ISO', 'Lens',
+    ])),
+)
+
+# memoized translations for the active language, see set_language(), preload() and i18n()
+TRANSLATIONS = {
+    'language': None,
+    'strings': {},
+}
+
 
 def decode_utf8(string):
     try:
@@ -235,102 +265,84 @@ def encode_utf8(string, py2_only=True):
     return string.encode('utf-8')
 
 
+def current_language():
+    """
+    :return: the language the memoized translations belong to
+    """
+    return TRANSLATIONS['language']
+
+
+def set_language(language=None):
+    """
+    Drop the memoized translations when the active language changed, strings are
+    translated lazily by i18n()
+
+    :param language: active language, if None Kodi will be asked
+    :return: True if the memoized translations were dropped
+    """
+    if language is None:
+        language = xbmc.getLanguage()
+
+    if TRANSLATIONS['language'] == language:
+        return False
+
+    TRANSLATIONS['language'] = language
+    TRANSLATIONS['strings'] = {}
+    return True
+
+
+def preload(language=None):
+    """
+    Translate all strings used by the add-on for the active language, used by the
+    long-lived service, plugin invocations translate lazily see set_language()
+
+    :param language: active language, if None Kodi will be asked
+    :return: True if the translations were (re)loaded, False if they were current
+    """
+    if not set_language(language) and TRANSLATIONS['strings']:
+        return False
+
+    __LOG.debug('Preloading translations for |%s|' % TRANSLATIONS['language'])
+    for string_id in STRINGS:
+        _ = i18n(string_id)
+
+    return True
+
+
 def i18n(string_id):
-    mapped_string_id = STRINGS.get(string_id)
-    if mapped_string_id:
-        string_id = mapped_string_id
+    translation = TRANSLATIONS['strings'].get(string_id)
+    if translation is not None:
+        return translation
+
+    mapped_string_id = STRINGS.get(string_id, string_id)
 
     try:
-        core = int(string_id) < 30000
+        core = int(mapped_string_id) < 30000
     except ValueError:
         __LOG.debug('Failed to map translation, returning id ...')
         return string_id
 
     if core:
-        return encode_utf8(xbmc.getLocalizedString(string_id))
+        translation = encode_utf8(xbmc.getLocalizedString(mapped_string_id))
+    else:
+        translation = encode_utf8(CONFIG['addon'].getLocalizedString(mapped_string_id))
 
-    return encode_utf8(CONFIG['addon'].getLocalizedString(string_id))
+    TRANSLATIONS['strings'][string_id] = translation
+    return translation
 
 
 def directory_item_translate(title, thumb):
-    translation_map = {}
-
-    if thumb.endswith('show.png'):
-        translation_map = {
-            'All Shows': 'All Shows',
-            'Unplayed': 'Unplayed',
-            'Unwatched': 'Unwatched',
-            'Recently Aired': 'Recently Aired',
-            'Recently Added': 'Recently Added',
-            'Recently Viewed Episodes': 'Recently Viewed Episodes',
-            'Recently Viewed Shows': 'Recently Viewed Shows',
-            'On Deck': 'On Deck',
-            'By Collection': 'By Collection',
-            'By First Letter': 'By First Letter',
-            'By Genre': 'By Genre',
-            'By Year': 'By Year',
-            'By Content Rating': 'By Content Rating',
-            'By Folder': 'By Folder',
-            'Search Shows...': 'Search Shows...',
-            'Search Episodes...': 'Search Episodes...',
-        }
-
-    elif thumb.endswith('artist.png'):
-        translation_map = {
-            'All Artists': 'All Artists',
-            'By Album': 'By Album',
-            'By Genre': 'By Genre',
-            'By Year': 'By Year',
-            'By Collection': 'By Collection',
-            'Recently Added': 'Recently Added',
-            'By Folder': 'By Folder',
-            'Search Artists...': 'Search Artists...',
-            'Search Albums...': 'Search Albums...',
-            'Search Tracks...': 'Search Tracks...',
-        }
-
-    elif thumb.endswith('movie.png') or thumb.endswith('video.png'):
-        translation_map = {
-            'All Movies': 'All Movies',
-            'Unplayed': 'Unplayed',
-            'Unwatched': 'Unwatched',
-            'Recently Released': 'Recently Released',
-            'Recently Added': 'Recently Added',
-            'Recently Viewed': 'Recently Viewed',
-            'On Deck': 'On Deck',
-            'By Collection': 'By Collection',
-            'By Genre': 'By Genre',
-            'By Year': 'By Year',
-            'By Decade': 'By Decade',
-            'By Director': 'By Director',
-            'By Starring Actor': 'By Starring Actor',
-            'By Country': 'By Country',
-            'By Content Rating': 'By Content Rating',
-            'By Rating': 'By Rating',
-            'By Resolution': 'By Resolution',
-            'By First Letter': 'By First Letter',
-            'By Folder': 'By Folder',
-            'Search...': 'Search...',
-        }
+    for suffixes, translatable in DIRECTORY_TRANSLATIONS:
+        if not thumb.endswith(suffixes):
+            continue
+
         if thumb.endswith('video.png') and title.startswith('All '):
             return i18n('All_') % title.replace('All ', '')
 
-    elif thumb.endswith('photo.png'):
-        translation_map = {
-            'All Photos': 'All Photos',
-            'By Year': 'By Year',
-            'Recently Added': 'Recently Added',
-            'Camera Make': 'Camera Make',
-            'Camera Model': 'Camera Model',
-            'Aperture': 'Aperture',
-            'Shutter Speed': 'Shutter Speed',
-            'ISO': 'ISO',
-            'Lens': 'Lens',
-        }
-
-    string = translation_map.get(title)
-    if string:
-        return i18n(string)
+        if title in translatable:
+            return i18n(title)
+
+        break
 
     return title
 
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2020 Composite (plugin.video.composite_for_plex)
+
+    This file is part of Composite (plugin.video.composite_for_plex)
+
+    SPDX-License-Identifier: GPL-2.0-or-later
+    See LICENSES/GPL-2.0-or-later.txt for more information.
+"""
+
+import threading
+import time
+
+import requests
+
+from .logger import Logger
+from .outbox import OutboxStore
+
+
+class TimelineReport:
+
+    def __init__(self, server, media_id, watched_time, state, duration):
+        self.server = server
+        self.media_id = media_id
+        self.watched_time = watched_time
+        self.state = state
+        self.duration = duration
+        self.attempts = 0
+        self.next_attempt = 0.0
+
+    def key(self):
+        return self.server.get_uuid(), self.media_id
+
+    def is_final(self):
+        return self.state == 'stopped'
+
+
+class TimelineReporterThread(threading.Thread):
+    """
+    Send timeline reports to the servers without blocking playback monitoring
+    Only the latest report per media is kept, failed reports are retried with a backoff
+    and final (stopped) reports are sent first
+    """
+    LOG = Logger('TimelineReporterThread')
+
+    BACKOFF_START = 2
+    BACKOFF_MAX = 60
+    MAX_ATTEMPTS = 5
+    MAX_FINAL_ATTEMPTS = 10
+
+    def __init__(self):
+        super(TimelineReporterThread, self).__init__()  # pylint: disable=super-with-arguments
+        self._stopped = threading.Event()
+        self._ended = threading.Event()
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = {}
+
+        # connections are reused for all reports
+        self._session = requests.Session()
+
+        self.daemon = True
+        self.start()
+
+    def stop(self):
+        self.LOG.debug('Stop event set...')
+        self._stopped.set()
+        self._wake.set()
+
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def end(self):
+        self.LOG.debug('End event set...')
+        self._ended.set()
+
+    def ended(self):
+        return self._ended.is_set()
+
+    def report(self, server, media_id, watched_time, state='playing', duration=0):
+        """
+        Queue a timeline report, replaces the pending report for the same media
+        A pending final report is only replaced by another final report
+        """
+        report = TimelineReport(server, media_id, watched_time, state, duration)
+
+        with self._lock:
+            pending = self._pending.get(report.key())
+            if pending is not None and pending.is_final() and not report.is_final():
+                return
+            self._pending[report.key()] = report
+
+        self._wake.set()
+
+    def _next_report(self):
+        now = time.time()
+        with self._lock:
+            due = [report for report in self._pending.values() if report.next_attempt <= now]
+            if not due:
+                return None
+
+            # final reports first, then the oldest attempt
+            due.sort(key=lambda report: (not report.is_final(), report.next_attempt))
+            return due[0]
+
+    def _send(self, report):
+        # a failed attempt marks the server offline and talk() skips offline servers,
+        # every attempt has to reach the network
+        report.server.offline = False
+        try:
+            sent = report.server.report_playback_progress(report.media_id, report.watched_time,
+                                                          state=report.state,
+                                                          duration=report.duration,
+                                                          session=self._session)
+        except Exception as error:  # pylint: disable=broad-except
+            self.LOG.debug('[%s]: report failed [%s]' % (report.media_id, error))
+            sent = False
+
+        with self._lock:
+            if self._pending.get(report.key()) is not report:
+                return  # superseded while sending
+
+            if sent:
+                del self._pending[report.key()]
+                return
+
+            report.attempts += 1
+            max_attempts = self.MAX_FINAL_ATTEMPTS if report.is_final() else self.MAX_ATTEMPTS
+            if report.attempts >= max_attempts:
+                self.LOG.debug('[%s]: moving %s report to the outbox after %s attempts' %
+                               (report.media_id, report.state, report.attempts))
+                del self._pending[report.key()]
+                self._queue(report)
+                return
+
+            backoff = min(self.BACKOFF_START * 2 ** (report.attempts - 1), self.BACKOFF_MAX)
+            report.next_attempt = time.time() + backoff
+            self.LOG.debug('[%s]: retrying %s report in %ss' %
+                           (report.media_id, report.state, backoff))
+
+    @staticmethod
+    def _queue(report):
+        store = OutboxStore()
+        store.record_progress(report.server.get_uuid(), report.media_id,
+                              report.watched_time, report.duration)
+        if (report.is_final() and report.duration and
+                int((float(report.watched_time) / float(report.duration)) * 100) >= 98):
+            store.record_watched(report.server.get_uuid(), report.media_id, True)
+
+    def _next_wait(self):
+        with self._lock:
+            if not self._pending:
+                return None
+            return max(0.0, min(report.next_attempt for report in self._pending.values()) -
+                       time.time())
+
+    def run(self):
+        while not self.stopped():
+            report = self._next_report()
+            if report is not None:
+                self._send(report)
+                continue
+
+            self._wake.wait(self._next_wait())
+            self._wake.clear()
+
+        # deliver the final reports once before ending
+        with self._lock:
+            final_reports = [report for report in self._pending.values() if report.is_final()]
+
+        for report in final_reports:
+            self._send(report)
+
+        with self._lock:
+            unsent = list(self._pending.values())
+            self._pending = {}
+
+        for report in unsent:
+            self._queue(report)
+
+        self._session.close()
+        self.end()
@@ -14,7 +14,10 @@ import math
 
 from .common import get_plugin_url
 from .constants import MODES
+from .containers import Context
 from .logger import Logger
+from .playback import prefetch_stream
+from .search_index import SearchIndex
 from .utils import notify_all
 
 
@@ -49,14 +52,22 @@ class UpNext:
             self.LOG.debug('Found metadata for S%sE%s' %
                            (str(ce_season).zfill(2), str(ce_episode).zfill(2)))
 
-            ne_metadata = self.get_next_episode_this_season(ce_metadata.get('parentRatingKey'),
-                                                            ce_season, ce_episode)
+            ne_metadata = self.get_indexed_next_episode(ce_metadata, ce_season, ce_episode)
 
             if ne_metadata is None:
-                ne_metadata = self.get_next_season_episode_one(
-                    ce_metadata.get('grandparentRatingKey'), ce_season
+                ne_metadata = self.get_next_episode_this_season(
+                    ce_metadata.get('parentRatingKey'), ce_season, ce_episode
                 )
 
+                if ne_metadata is None:
+                    ne_metadata = self.get_next_season_episode_one(
+                        ce_metadata.get('grandparentRatingKey'), ce_season
+                    )
+
+                if ne_metadata is not None:
+                    ne_metadata = (self.prefetch(ne_metadata.get('ratingKey'), ce_metadata) or
+                                   ne_metadata)
+
         if ce_metadata is not None and ne_metadata is not None:
             self.LOG.debug('Found metadata for S%sE%s and S%sE%s' %
                            (ce_metadata.get('parentIndex', '0').zfill(2),
@@ -84,6 +95,57 @@ class UpNext:
             pass
         return metadata
 
+    def get_indexed_next_episode(self, metadata, season, episode):
+        """
+        Get the metadata for the next episode from the search index, without listing
+        the season or show
+
+        :param metadata: metadata of the `current_episode`
+        :param season: season of `current_episode`
+        :param episode: episode of `current_episode`
+        """
+        if not self.settings.search_index():
+            return None
+
+        section = metadata.get('librarySectionID')
+        show = metadata.get('grandparentRatingKey')
+        if not section or not show:
+            return None
+
+        search_index = SearchIndex()
+        for next_season, next_episode in ((season, episode + 1), (season + 1, 1)):
+            media_id = search_index.find_episode(self.server, section, show,
+                                                 next_season, next_episode)
+            if media_id is not None:
+                self.LOG.debug('Found S%sE%s in the search index' %
+                               (str(next_season).zfill(2), str(next_episode).zfill(2)))
+                return self.prefetch(media_id, metadata)
+
+        return None
+
+    def prefetch(self, media_id, current_metadata):
+        """
+        Prefetch the stream data of the next episode, playing it won't request its metadata
+        The stream data is kept for the runtime of the `current_episode`
+
+        :param media_id: id of the next episode on the plex server
+        :param current_metadata: metadata of the `current_episode`
+        :return: metadata of the next episode, or None if it couldn't be prefetched
+        """
+        try:
+            remaining = (int(current_metadata.get('duration', 0)) -
+                         int(current_metadata.get('viewOffset', 0))) / 1000
+        except ValueError:
+            remaining = 0
+
+        context = Context()
+        context.settings = self.settings
+        try:
+            return prefetch_stream(context, self.server, media_id, max(remaining, 0))
+        except Exception as error:  # pylint: disable=broad-except
+            self.LOG.debug('Unable to prefetch %s [%s]' % (media_id, error))
+            return None
+
     def get_next_episode_this_season(self, media_id, season, episode):
         """
         Get the metadata for the next episode of this season
@@ -10,12 +10,11 @@
     See LICENSES/GPL-2.0-or-later.txt for more information.
 """
 
+import heapq
 import json
-import os
 import time
 
 from six import PY3
-from six.moves import cPickle as pickle
 from six.moves import xrange
 
 from kodi_six import xbmc  # pylint: disable=import-error
@@ -28,17 +27,76 @@ from ..addon.strings import i18n
 LOG = Logger()
 
 
-def get_xml(context, url, tree=None):
+def get_xml(context, url, tree=None, quiet=False):
+    """
+    :param quiet: don't show server messages, for listings created in the background
+    """
     if tree is None:
         tree = context.plex_network.get_processed_xml(url)
 
     if tree.get('message'):
-        xbmcgui.Dialog().ok(tree.get('header', i18n('Message')), tree.get('message', ''))
+        if not quiet:
+            xbmcgui.Dialog().ok(tree.get('header', i18n('Message')), tree.get('message', ''))
         return None
 
     return tree
 
 
+def partition_by_section(tree, section_keys, size=0, hide_watched=False):
+    """
+    Partition the videos of a server-wide listing by library section
+
+    :param tree: server-wide listing ie. /library/onDeck, /library/recentlyAdded
+    :param section_keys: keys of the sections to keep, in listing order
+    :param size: maximum number of videos per section, 0 for no limit
+    :param hide_watched: skip watched videos
+    :return: list of videos ordered by section
+    """
+    partitions = dict((str(key), []) for key in section_keys)
+
+    for branch in tree.getiterator('Video'):
+        partition = partitions.get(branch.get('librarySectionID', tree.get('librarySectionID')))
+        if partition is None:
+            continue
+        if hide_watched and branch.get('viewCount'):
+            continue
+        if size <= 0 or len(partition) < size:
+            partition.append(branch)
+
+    branches = []
+    for key in section_keys:
+        branches += partitions[str(key)]
+
+    return branches
+
+
+def merge_top(candidates, size, attributes):
+    """
+    Merge videos from several servers and sections into one list, newest first
+
+    :param candidates: list of tuples (server, tree, video)
+    :param size: number of videos to keep, 0 to keep all videos
+    :param attributes: video attributes to order by, the first available attribute is used
+                       ie. ('lastViewedAt', 'addedAt')
+    :return: list of tuples (server, tree, video)
+    """
+    def _key(candidate):
+        for attribute in attributes:
+            value = candidate[2].get(attribute)
+            if value:
+                try:
+                    return int(value)
+                except ValueError:
+                    continue
+        return 0
+
+    if size <= 0:
+        return sorted(candidates, key=_key, reverse=True)
+
+    # only keep the top size candidates on the heap instead of sorting all of them
+    return heapq.nlargest(size, candidates, key=_key)
+
+
 def get_master_server(context, all_servers=False):
     possible_servers = []
     append_server = possible_servers.append
@@ -98,31 +156,6 @@ def get_transcode_profile(context):
     return result
 
 
-def write_pickled(filename, data):
-    try:
-        os.makedirs(CONFIG['temp_path'])
-    except:  # pylint: disable=bare-except
-        pass
-    filename = os.path.join(CONFIG['temp_path'], filename)
-    pickled_data = pickle.dumps(data, protocol=2)
-    with open(filename, 'wb') as open_file:
-        open_file.write(pickled_data)
-
-
-def read_pickled(filename, delete_after=True):
-    filename = os.path.join(CONFIG['temp_path'], filename)
-    if not os.path.exists(filename):
-        return None
-    with open(filename, 'rb') as open_file:
-        pickled_data = open_file.read()
-    if delete_after:
-        try:
-            os.remove(filename)
-        except:  # pylint: disable=bare-except
-            pass
-    return pickle.loads(pickled_data)
-
-
 def notify_all(encoding, method, data):
     next_data = json.dumps(data)
     if not isinstance(next_data, bytes):
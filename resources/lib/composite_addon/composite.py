@@ -14,14 +14,17 @@ import platform
 import sys
 import time
 
+from .addon import cache_stats
 from .addon.common import get_handle
 from .addon.common import get_params
 from .addon.constants import COMMANDS
 from .addon.constants import CONFIG
 from .addon.constants import MODES
+from .addon.constants import WIDGET_MODES
 from .addon.containers import Context
 from .addon.logger import Logger
 from .addon.settings import AddonSettings
+from .addon.strings import set_language
 
 LOG = Logger()
 
@@ -30,6 +33,8 @@ def run(start_time):  # pylint: disable=too-many-locals, too-many-statements, to
     context = Context()
     context.settings = AddonSettings()
 
+    _ = set_language()  # translations are memoized lazily by i18n
+
     if context.settings.wake_on_lan():
         from .addon.wol import wake_servers  # pylint: disable=import-outside-toplevel
         wake_servers(context)
@@ -177,6 +182,11 @@ def run(start_time):  # pylint: disable=too-many-locals, too-many-statements, to
         kodi_library.run(context)
         return _finished(start_time)
 
+    if mode in WIDGET_MODES and context.settings.background_widgets():
+        from .routes import widget_listings  # pylint: disable=import-outside-toplevel
+        if widget_listings.serve(context):
+            return _finished(start_time)
+
     if mode in [MODES.GETCONTENT, MODES.TXT_TVSHOWS, MODES.TXT_MOVIES,
                 MODES.TXT_MOVIES_ON_DECK, MODES.TXT_MOVIES_RECENT_ADDED,
                 MODES.TXT_MOVIES_RECENT_RELEASE, MODES.TXT_TVSHOWS_ON_DECK,
@@ -411,4 +421,5 @@ def _start(data):
 
 
 def _finished(start_time):
+    cache_stats.flush()
     LOG.notice('Finished. |%.3fs|' % (time.time() - start_time))
@@ -12,13 +12,11 @@
 
 import base64
 import hashlib
-import socket
 import traceback
 import xml.etree.ElementTree as ETree
 
 import requests
 from six import PY3
-from six import iteritems
 from six import string_types
 from six.moves.urllib_parse import urlparse
 
@@ -27,6 +25,7 @@ from kodi_six import xbmcgui  # pylint: disable=import-error
 from ..addon import cache_control
 from ..addon.common import get_platform_ip
 from ..addon.common import is_ip
+from ..addon.common import resolve_hostname
 from ..addon.constants import CONFIG
 from ..addon.dialogs.progress_dialog import ProgressDialog
 from ..addon.logger import Logger
@@ -38,6 +37,7 @@ from .plexcommon import get_client_identifier
 from .plexgdm import PlexGDM
 from .plexsection import PlexSection
 from .plexserver import PlexMediaServer
+from .plexserverlist import PlexServerList
 
 DEFAULT_PORT = '32400'
 LOG = Logger('plex')
@@ -54,7 +54,7 @@ class Plex:  # pylint: disable=too-many-public-methods, too-many-instance-attrib
         self.myplex_token = None
         self.effective_user = None
         self.effective_token = None
-        self.server_list = {}
+        self.server_list = PlexServerList(self.cache)
         self.discovered = False
         self.server_list_cache = 'discovered_plex_servers.cache'
         self.plexhome_cache = 'plexhome_user.pcache'
@@ -180,7 +180,11 @@ class Plex:  # pylint: disable=too-many-public-methods, too-many-instance-attrib
         except ValueError:
             ttl = 3600
 
-        data_ok, self.server_list = self.cache.check_cache(self.server_list_cache, ttl)
+        data_ok, snapshot = self.cache.check_cache(self.server_list_cache, ttl)
+
+        self.server_list = PlexServerList(self.cache)
+        if data_ok:
+            data_ok = self.server_list.load_snapshot(snapshot, ttl)
 
         if data_ok:
             if not self.check_server_version():
@@ -193,9 +197,9 @@ class Plex:  # pylint: disable=too-many-public-methods, too-many-instance-attrib
 
         if not data_ok or not self.server_list:
             LOG.debug('unsuccessful')
-            self.server_list = {}
+            self.server_list = PlexServerList(self.cache)
             if not self.discover():
-                self.server_list = {}
+                self.server_list = PlexServerList(self.cache)
 
         LOG.debug('Server list is now: %s' % self.server_list)
 
@@ -264,14 +268,14 @@ class Plex:  # pylint: disable=too-many-public-methods, too-many-instance-attrib
         self.cache.write_cache(self.plexhome_cache, self.plexhome_settings)
 
     def check_server_version(self):
-        for _uuid, servers in iteritems(self.server_list):
-            try:
-                if not servers.get_revision() == CONFIG['required_revision']:
-                    LOG.debug('Old object revision found')
-                    return False
-            except:  # pylint: disable=bare-except
+        for _uuid, entry in self.server_list.entries():
+            revision = entry.get('revision')
+            if revision is None:
                 LOG.debug('No revision found')
                 return False
+            if not revision == CONFIG['required_revision']:
+                LOG.debug('Old object revision found')
+                return False
         return True
 
     def check_user(self):
@@ -279,8 +283,8 @@ class Plex:  # pylint: disable=too-many-public-methods, too-many-instance-attrib
         if self.effective_user is None:
             return True
 
-        for _uuid, servers in iteritems(self.server_list):
-            if not servers.get_user() == self.effective_user:
+        for _uuid, entry in self.server_list.entries():
+            if not entry.get('user') == self.effective_user:
                 LOG.debug('authorized user mismatch')
                 return False
         return True
@@ -385,13 +389,13 @@ class Plex:  # pylint: disable=too-many-public-methods, too-many-instance-attrib
                             line1=i18n('Please wait...'), background=True) as progress_dialog:
             try:
                 percent = 0
-                self.server_list = {}
+                self.server_list = PlexServerList(self.cache)
                 # First discover the servers we should know about from myplex
                 if self.is_myplex_signedin():
                     LOG.debug('Adding myPlex as a server location')
                     progress_dialog.update(percent=percent, line1=i18n('myPlex discovery...'))
 
-                    self.server_list = self.get_myplex_servers()
+                    self.server_list = PlexServerList(self.cache, self.get_myplex_servers())
 
                     if self.server_list:
                         LOG.debug('MyPlex discovery completed successfully')
@@ -415,13 +419,9 @@ class Plex:  # pylint: disable=too-many-public-methods, too-many-instance-attrib
                 percent += 40
                 progress_dialog.update(percent=percent, line1=i18n('Caching results...'))
 
-                for server_uuid in list(self.server_list.keys()):
-                    self.server_list[server_uuid].settings = None  # can't pickle xbmcaddon.Addon()
+                self.server_list.save(self.server_list_cache)
 
-                self.cache.write_cache(self.server_list_cache, self.server_list)
-
-                servers = list(map(lambda x: (self.server_list[x].get_name(), x),
-                                   self.server_list.keys()))
+                servers = list(map(lambda x: (x[1]['name'], x[0]), self.server_list.entries()))
 
                 server_names = ', '.join(map(lambda x: x[0], servers))
 
@@ -655,6 +655,12 @@ class Plex:  # pylint: disable=too-many-public-methods, too-many-instance-attrib
             # We probably have an address:port being passed
             uri, port = uri.split(':')
 
+        # host names of known servers, including plex.direct names and custom
+        # access urls, are found without cleaning or resolving them
+        server = self._find_server(scheme, uri, port)
+        if server is not None:
+            return server
+
         if is_ip(uri):
             LOG.debug('IP address detected - passing through')
         elif 'plex.direct' in uri:
@@ -667,27 +673,29 @@ class Plex:  # pylint: disable=too-many-public-methods, too-many-instance-attrib
                 uri = clean_address
             else:
                 LOG.debug('Unable to clean plex.direct name')
-        else:
-            try:
-                socket.gethostbyname(uri)
-            except:  # pylint: disable=bare-except
-                LOG.debug('Unable to lookup hostname: %s' % uri)
-                return PlexMediaServer(name='dummy', address='127.0.0.1',
-                                       port=32400, discovery='local')
-
-        server_list = self.server_list.values()
-        for server in server_list:
+        elif resolve_hostname(uri) is None:
+            LOG.debug('Unable to lookup hostname: %s' % uri)
+            return PlexMediaServer(name='dummy', address='127.0.0.1',
+                                   port=32400, discovery='local')
 
-            LOG.debug('[%s] - checking ip:%s against server ip %s' %
-                      (server.get_name(), uri, server.get_address()))
-
-            if server.find_address_match(scheme, uri, port):
-                return server
+        server = self._find_server(scheme, uri, port)
+        if server is not None:
+            return server
 
         LOG.debug('Unable to translate - Returning new plex server set to %s' % uri)
 
         return PlexMediaServer(name=i18n('Unknown'), address=uri, port=port, discovery='local')
 
+    def _find_server(self, scheme, host, port):
+        server_uuid = self.server_list.find(scheme, host, port)
+        if server_uuid is None:
+            return None
+
+        try:
+            return self.server_list[server_uuid]
+        except KeyError:
+            return None
+
     def get_server_from_url(self, url):
         url_parts = urlparse(url)
         return self.get_server_from_parts(url_parts.scheme, url_parts.netloc)
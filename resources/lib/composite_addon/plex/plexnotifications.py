@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2020 Composite (plugin.video.composite_for_plex)
+
+    This file is part of Composite (plugin.video.composite_for_plex)
+
+    SPDX-License-Identifier: GPL-2.0-or-later
+    See LICENSES/GPL-2.0-or-later.txt for more information.
+"""
+
+import json
+import threading
+import time
+
+import requests
+
+from kodi_six import xbmcgui  # pylint: disable=import-error
+
+from ..addon.constants import CONFIG
+from ..addon.logger import Logger
+
+LOG = Logger('plexnotifications')
+
+EVENTSOURCE_PATH = '/:/eventsource/notifications'
+EVENT_FILTERS = 'timeline,activity'
+
+# timeline states for library items that finished processing and were deleted
+TIMELINE_CHANGED_STATES = (5, 9)
+# activities that change the content of a library section when they have ended
+SECTION_ACTIVITIES = ('library.update.section', 'library.refresh.items')
+
+# home window property skins can add to widget paths to reload them on content changes
+# ie. plugin://plugin.video.composite_for_plex/?mode=...&reload=$INFO[Window(Home).Property(...)]
+WIDGET_RELOAD_PROPERTY = '%s.widget_reload' % CONFIG['id']
+
+
+def parse_event_stream(lines):
+    """
+    Parse a server-sent event stream
+
+    :param lines: iterable of decoded lines
+    :return: generator of tuples (event, data), data is the decoded json payload
+    """
+    event = None
+    data = []
+
+    for line in lines:
+        if line is None:
+            continue
+
+        if not line:
+            if data:
+                try:
+                    payload = json.loads('\n'.join(data))
+                except ValueError:
+                    LOG.debug('Unable to decode event data: %s' % '\n'.join(data))
+                else:
+                    yield event or 'message', payload
+            event = None
+            data = []
+            continue
+
+        if line.startswith(':'):
+            continue  # comment, used as keep-alive
+
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+
+        if field == 'event':
+            event = value
+        elif field == 'data':
+            data.append(value)
+
+
+class NotificationHandler:
+    """
+    Map server notifications to data cache invalidations,
+    content changes are collected until flush()
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self._lock = threading.Lock()
+        self._changed = False
+
+    def handle(self, event, data):
+        container = data.get('NotificationContainer', data)
+        notification_type = container.get('type', event)
+
+        if notification_type == 'timeline':
+            self._timeline(container.get('TimelineEntry', []))
+        elif notification_type == 'activity':
+            self._activity(container.get('ActivityNotification', []))
+
+    def _timeline(self, entries):
+        sections = set()
+
+        for entry in entries:
+            section = str(entry.get('sectionID', '-1'))
+            if section == '-1' or entry.get('state') not in TIMELINE_CHANGED_STATES:
+                continue
+
+            if entry.get('itemID'):
+                self.server.invalidate_item(entry.get('itemID'))
+            sections.add(section)
+
+        if sections:
+            LOG.debug('[%s] content changed in sections %s' %
+                      (self.server.get_uuid(), ', '.join(sorted(sections))))
+            self._content_changed()
+
+    def _activity(self, notifications):
+        for notification in notifications:
+            if notification.get('event') != 'ended':
+                continue
+
+            activity = notification.get('Activity', {})
+            if activity.get('type') not in SECTION_ACTIVITIES:
+                continue
+
+            LOG.debug('[%s] activity ended: %s' % (self.server.get_uuid(), activity.get('type')))
+            self._content_changed()
+
+    def _content_changed(self):
+        self.server.invalidate_section_revisions()
+        with self._lock:
+            self._changed = True
+
+    def flush(self):
+        """
+        :return: True if content changed since the last flush
+        """
+        with self._lock:
+            changed = self._changed
+            self._changed = False
+
+        return changed
+
+
+class NotificationListenerThread(threading.Thread):
+    """
+    Listen to a server-sent event source, reconnects with an exponential backoff
+    The url is configurable to allow a local stand-in event source
+    """
+    LOG = Logger('NotificationListenerThread')
+
+    BACKOFF_START = 1
+    BACKOFF_MAX = 300
+    # connections lasting this long reset the backoff
+    BACKOFF_RESET = 60
+
+    def __init__(self, url, params, handler, verify=True):
+        super(NotificationListenerThread, self).__init__()  # pylint: disable=super-with-arguments
+        self._stopped = threading.Event()
+        self._ended = threading.Event()
+
+        self.url = url
+        self.params = params
+        self.handler = handler
+        self.verify = verify
+
+        self._response = None
+
+        self.daemon = True
+        self.start()
+
+    def stop(self):
+        self.LOG.debug('[%s]: Stop event set...' % self.url)
+        self._stopped.set()
+        response = self._response
+        if response is not None:
+            response.close()  # unblock the stream
+
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def end(self):
+        self.LOG.debug('[%s]: End event set...' % self.url)
+        self._ended.set()
+
+    def ended(self):
+        return self._ended.is_set()
+
+    def _listen(self):
+        """
+        :return: True if the event source was connected for at least BACKOFF_RESET seconds
+        """
+        try:
+            self._response = requests.get(self.url, params=self.params, stream=True,
+                                          verify=self.verify, timeout=(2, 120))
+        except requests.exceptions.RequestException as error:
+            self.LOG.debug('[%s]: connection failed [%s]' % (self.url, error))
+            return False
+
+        connected = time.time()
+        try:
+            if self._response.status_code != requests.codes.ok:  # pylint: disable=no-member
+                self.LOG.debug('[%s]: unexpected response %s' %
+                               (self.url, self._response.status_code))
+                return False
+
+            self.LOG.debug('[%s]: connected' % self.url)
+            lines = self._response.iter_lines(decode_unicode=True)
+            for event, data in parse_event_stream(lines):
+                if self.stopped():
+                    break
+                try:
+                    self.handler.handle(event, data)
+                except Exception as error:  # pylint: disable=broad-except
+                    self.LOG.error('[%s]: failed to handle %s event [%s]' %
+                                   (self.url, event, error))
+
+        except Exception as error:  # pylint: disable=broad-except
+            if not self.stopped():
+                self.LOG.debug('[%s]: connection lost [%s]' % (self.url, error))
+        finally:
+            self._response.close()
+            self._response = None
+
+        return time.time() - connected >= self.BACKOFF_RESET
+
+    def run(self):
+        backoff = self.BACKOFF_START
+
+        while not self.stopped():
+            if self._listen():
+                backoff = self.BACKOFF_START
+
+            if self.stopped():
+                break
+
+            self.LOG.debug('[%s]: reconnecting in %ss' % (self.url, backoff))
+            if self._stopped.wait(backoff):
+                break
+            backoff = min(backoff * 2, self.BACKOFF_MAX)
+
+        self.end()
+
+
+class NotificationListeners:
+    """
+    Notification listeners for all owned servers, used by the service
+    """
+
+    def __init__(self, window=None):
+        self.window = window if window is not None else xbmcgui.Window(10000)
+        self.listeners = []
+
+    def start(self, servers):
+        self.stop()
+
+        for server in servers:
+            if not server.is_owned() or server.is_offline():
+                continue
+
+            url = '%s://%s:%s%s' % (server.protocol, server.get_address(),
+                                    server.get_port(), EVENTSOURCE_PATH)
+            params = {
+                'filters': EVENT_FILTERS,
+            }
+            if server.get_token():
+                params['X-Plex-Token'] = server.get_token()
+
+            LOG.debug('Listening for notifications from %s' % server.get_name())
+            handler = NotificationHandler(server)
+            self.listeners.append(NotificationListenerThread(
+                url, params, handler, verify=server.ssl_certificate_verification
+            ))
+
+    def flush(self):
+        """
+        Reload widgets once for all content changes since the last flush
+
+        :return: True if widgets were reloaded
+        """
+        changed = False
+        for listener in self.listeners:
+            changed = listener.handler.flush() or changed
+
+        if changed:
+            LOG.debug('Reloading widgets')
+            self.window.setProperty(WIDGET_RELOAD_PROPERTY, str(int(time.time())))
+
+        return changed
+
+    def stop(self):
+        for listener in self.listeners:
+            if not listener.stopped():
+                listener.stop()
+
+        for listener in self.listeners:
+            listener.join(2)
+
+        self.listeners = []
+
+    def __bool__(self):
+        return bool(self.listeners)
+
+    __nonzero__ = __bool__
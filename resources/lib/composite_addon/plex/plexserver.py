@@ -11,6 +11,7 @@
 """
 
 import copy
+import re
 import threading
 import time
 import uuid
@@ -25,10 +26,16 @@ from six.moves.urllib_parse import urlencode
 from six.moves.urllib_parse import urlparse
 from six.moves.urllib_parse import urlunparse
 
+from kodi_six import xbmcgui  # pylint: disable=import-error
+
+from ..addon import cache_stats
+from ..addon import link_estimates
 from ..addon.constants import CONFIG
 from ..addon.data_cache import DATA_CACHE
 from ..addon.logger import Logger
 from ..addon.settings import AddonSettings
+from ..addon.single_flight import SINGLE_FLIGHT
+from ..addon.single_flight import ProcessLease
 from ..addon.strings import encode_utf8
 from . import plexsection
 from .plexcommon import create_plex_identification
@@ -38,6 +45,28 @@ from .plexcommon import get_device_name
 DEFAULT_PORT = '32400'
 LOG = Logger('plexserver')
 
+# section revisions are confirmed with one /library/sections request per interval
+SECTION_REVISION_INTERVAL = 60
+# containers tied to an unchanged section revision are kept up to this age
+SECTION_REVISION_MAX_AGE = 24 * 3600
+# last confirmed section revisions, keyed by server uuid, values are tuples (checked, revisions)
+SECTION_REVISIONS = {}
+SECTION_PATH_RE = re.compile(r'^/library/sections/(?P<section>[^/?]+)/')
+# listings of these paths change with the watch state, which doesn't change the section revision
+WATCH_STATE_PATHS = ('onDeck', 'unwatched', 'recentlyViewed')
+# items of these types have a watch state, ie. videos and the directories of shows and seasons
+WATCH_STATE_TYPES = ('movie', 'show', 'season', 'episode', 'clip')
+
+# lowest bitrate in kbps for each transcode resolution, when the bitrate is limited by the link
+TRANSCODE_RESOLUTIONS = (
+    (8000, '1920x1080'),
+    (3000, '1280x720'),
+    (2000, '1024x768'),
+    (1500, '720x480'),
+    (720, '576x320'),
+    (0, '420x420'),
+)
+
 LOG.debug('Using Requests version for HTTP: %s' % requests.__version__)
 
 
@@ -198,31 +227,17 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
             return True
         return False
 
-    def find_address_match(self, scheme, ipaddress, port):
-        if not port:
-            port = ''
-
-        LOG.debug('Checking [%s://%s%s] against [%s]' %
-                  (scheme, ipaddress, '' if not port else ':' + port, self.access_uri))
-        uri = '%s://%s' % (scheme, ipaddress)
-        uri += ':' + port if port else ''
-        if self.access_uri.startswith(uri) and uri.count(':') == self.access_uri.count(':'):
-            return True
-
-        LOG.debug('Checking [%s:%s] against [%s]' % (ipaddress, port, self.access_address))
-        if '%s:%s' % (ipaddress, port) == self.access_address:
-            return True
-
-        LOG.debug('Checking [%s:%s] against [%s]' % (ipaddress, port, self.external_address))
-        if '%s:%s' % (ipaddress, port) == self.external_address:
-            return True
-
-        for test_address in self.local_address:
-            LOG.debug('Checking [%s:%s] against [%s:%s]' % (ipaddress, port, ipaddress, 32400))
-            if '%s:%s' % (ipaddress, port) == '%s:%s' % (test_address, 32400):
-                return True
+    def get_addresses(self):
+        return {
+            'access_uri': self.access_uri,
+            'access_address': self.access_address,
+            'external_address': self.external_address,
+            'local_address': list(self.local_address),
+            'custom_access_urls': list(self.custom_access_urls),
+        }
 
-        return False
+    def find_address_match(self, scheme, ipaddress, port):
+        return address_match(self.get_addresses(), scheme, ipaddress, port)
 
     def get_user(self):
         return self.user
@@ -534,11 +549,14 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
             self.set_protocol('https')
             LOG.debug('[%s] Server appears to be offline' % self.uuid)
 
-    def _request(self, uri, params, method):
+    def _request(self, uri, params, method, headers=None, session=None):
+        if session is None:
+            session = requests
+
         try:
-            response = getattr(requests, method)(uri, params=params,
-                                                 verify=self.ssl_certificate_verification,
-                                                 timeout=(2, 60))
+            response = getattr(session, method)(uri, params=params, headers=headers,
+                                                verify=self.ssl_certificate_verification,
+                                                timeout=(2, 60))
         except AttributeError:
             response = None
 
@@ -547,7 +565,14 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
 
         return response
 
-    def talk(self, url='/', refresh=False, method='get', extra_headers=None):
+    def talk(self, url='/', refresh=False, method='get', extra_headers=None,
+             validators=None, details=None, session=None):
+        """
+        :param validators: cache validators, dict with etag and last_modified, makes the
+                           request conditional and returns None if the data is not modified
+        :param details: dict updated with the response status, validators and size
+        :param session: requests session to reuse connections, optional
+        """
         if extra_headers is None:
             extra_headers = {}
 
@@ -561,8 +586,16 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
             if params is not None:
                 params.update(extra_headers)
 
+            headers = None
+            if validators:
+                headers = {}
+                if validators.get('etag'):
+                    headers['If-None-Match'] = validators['etag']
+                if validators.get('last_modified'):
+                    headers['If-Modified-Since'] = validators['last_modified']
+
             try:
-                response = self._request(uri, params, method)
+                response = self._request(uri, params, method, headers, session)
                 self.offline = False
 
             except requests.exceptions.ConnectionError as error:
@@ -572,7 +605,8 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
                 if self.protocol == 'https' and refresh:
                     LOG.debug('Server: %s - switching to http' % self.get_address())
                     self.set_protocol('http')
-                    return self.talk(url, refresh, method)
+                    return self.talk(url, refresh, method, validators=validators,
+                                     details=details, session=session)
 
                 self.offline = True
 
@@ -581,10 +615,25 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
 
             else:
                 LOG.debug('URL was: %s using %s' % (response.url, self.protocol))
+                self._record_link_sample(response)
+
+                not_modified = requests.codes.not_modified  # pylint: disable=no-member
+                if headers and response.status_code == not_modified:
+                    LOG.debug('Response: 304 Not Modified')
+                    if details is not None:
+                        details['status'] = response.status_code
+                    return None
 
                 if response.status_code == requests.codes.ok:  # pylint: disable=no-member
                     LOG.debug('Response: 200 OK - Encoding: %s' % response.encoding)
                     data = encode_utf8(response.text, py2_only=False)
+                    if details is not None:
+                        details.update({
+                            'status': response.status_code,
+                            'etag': response.headers.get('ETag'),
+                            'last_modified': response.headers.get('Last-Modified'),
+                            'size': len(response.content),
+                        })
                     LOG.debug('DOWNLOAD: It took %.2f seconds to retrieve data from %s' %
                               ((time.time() - start_time), self.get_address()))
                     return data
@@ -601,6 +650,68 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
                '<message status="offline">' \
                '</message>'
 
+    def get_connection_key(self):
+        return '%s|%s:%s' % (self.get_uuid(), self.get_address(), self.get_port())
+
+    def _record_link_sample(self, response):
+        """
+        Record the round trip time of a response, the throughput is only measured by
+        probe_throughput, api responses are too small to be limited by the link
+        """
+        try:
+            rtt = response.elapsed.total_seconds()
+        except AttributeError:
+            return
+
+        link_estimates.record(self.get_connection_key(), rtt)
+
+    def get_link_bitrate(self):
+        """
+        :return: bitrate in kbps that playback from the current connection can sustain,
+                 or None if the throughput is unknown
+        """
+        return link_estimates.usable_bitrate(self.get_connection_key())
+
+    def probe_throughput(self, path, size=2 * 1024 * 1024):
+        """
+        Measure the throughput of the current connection by downloading the start of a file
+
+        :param path: path of the file ie. the key of a media part
+        :param size: bytes to download
+        :return: True if a sample was recorded
+        """
+        uri = '%s://%s:%s%s' % (self.protocol, self.get_address(), self.get_port(), path)
+        headers = {'Range': 'bytes=0-%d' % (size - 1)}
+
+        start_time = time.time()
+        received = 0
+        try:
+            response = requests.get(uri, params=copy.deepcopy(self.plex_identification_header),
+                                    headers=headers, verify=self.ssl_certificate_verification,
+                                    timeout=(2, 10), stream=True)
+            try:
+                if response.status_code not in (200, 206):
+                    LOG.debug('Probe: unexpected response %s' % response.status_code)
+                    return False
+
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    received += len(chunk)
+                    if received >= size:
+                        break
+            finally:
+                response.close()
+
+        except requests.exceptions.RequestException as error:
+            LOG.debug('Probe: failed for %s [%s]' % (self.get_address(), error))
+            return False
+
+        duration = time.time() - start_time
+        link_estimates.record(self.get_connection_key(), response.elapsed.total_seconds(),
+                              received, duration, save=True)
+        LOG.debug('Probe: received %s bytes from %s in %.2fs' %
+                  (received, self.get_address(), duration))
+        return True
+
     def post(self, url, refresh=False, extra_headers=None):
         if extra_headers is None:
             extra_headers = {}
@@ -639,16 +750,61 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
 
     def discover_sections(self):
         plex_section = plexsection.PlexSection
-        self.section_list = list(map(plex_section, self.processed_xml('/library/sections')))
+        tree = self.check_section_revisions()
+        if tree is None:
+            tree = self.processed_xml('/library/sections')
+        self.section_list = list(map(plex_section, tree))
+
+    def get_section_revisions(self):
+        """
+        :return: dict of section key to revision, empty if the revisions are unavailable
+        """
+        _ = self.check_section_revisions()
+        return SECTION_REVISIONS.get(self.get_uuid(), (0, {}))[1]
+
+    def check_section_revisions(self):
+        """
+        Confirm the section revisions (updatedAt and contentChangedAt) with one
+        /library/sections request, at most once every SECTION_REVISION_INTERVAL seconds
+
+        :return: the /library/sections tree if it was requested, otherwise None
+        """
+        now = time.time()
+        checked, _ = SECTION_REVISIONS.get(self.get_uuid(), (0, {}))
+        if now - checked < SECTION_REVISION_INTERVAL and \
+                not self._section_revisions_invalidated(checked):
+            return None
+
+        cache_name = self._section_revisions_cache_name()
+        is_valid, revisions = DATA_CACHE.check_cache(cache_name, SECTION_REVISION_INTERVAL)
+        if is_valid and revisions is not None:
+            SECTION_REVISIONS[self.get_uuid()] = (now, revisions)
+            return None
+
+        tree = self.process_xml(self.talk('/library/sections'))
+        if tree is None or tree.tag != 'MediaContainer':
+            SECTION_REVISIONS[self.get_uuid()] = (now, {})
+            return None
+
+        revisions = dict(
+            (section.get('key'), '%s:%s' % (section.get('updatedAt'),
+                                           section.get('contentChangedAt')))
+            for section in tree
+        )
+        LOG.debug('Section revisions for %s: %s' % (self.get_uuid(), revisions))
+
+        SECTION_REVISIONS[self.get_uuid()] = (now, revisions)
+        DATA_CACHE.write_cache(cache_name, revisions)
+        return tree
 
-    def get_recently_added(self, section=-1, start=0, size=0, hide_watched=True):
+    def get_recently_added(self, section=-1, start=0, size=0, hide_watched=True,
+                           item_type=None):
         arguments = {
             'unwatched': 1 if hide_watched else 0,
         }
 
-        if section < 0:
-            url = '?'.join(['/library/recentlyAdded', urlencode(arguments)])
-            return self.processed_xml(self._update_path(url))
+        if item_type:
+            arguments['type'] = str(item_type)
 
         if size > 0:
             arguments.update({
@@ -656,21 +812,28 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
                 'X-Plex-Container-Size': size,
             })
 
+        if section < 0:
+            url = '?'.join(['/library/recentlyAdded', urlencode(arguments)])
+            return self.processed_xml(self._update_path(url))
+
         url = '?'.join(['/library/sections/%s/recentlyAdded' % section, urlencode(arguments)])
         return self.processed_xml(self._update_path(url))
 
     def get_ondeck(self, section=-1, start=0, size=0):
         arguments = {}
 
-        if section < 0:
-            return self.processed_xml(self._update_path('/library/onDeck'))
-
         if size > 0:
             arguments.update({
                 'X-Plex-Container-Start': start,
                 'X-Plex-Container-Size': size,
             })
 
+        if section < 0:
+            if arguments:
+                url = '?'.join(['/library/onDeck', urlencode(arguments)])
+                return self.processed_xml(self._update_path(url))
+            return self.processed_xml(self._update_path('/library/onDeck'))
+
         url = '?'.join(['/library/sections/%s/onDeck' % section, urlencode(arguments)])
         return self.processed_xml(self._update_path(url))
 
@@ -693,6 +856,69 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
         url = '?'.join(['/library/sections/%s/all' % section, urlencode(arguments)])
         return self.processed_xml(self._update_path(url))
 
+    def get_section_listing(self, section, item_type):
+        """
+        Request all items of a type in a section, bypasses the data cache
+
+        :param section: section key
+        :param item_type: plex item type
+        :return: tree or None if the request failed
+        """
+        return self.get_section_changes(section, item_type=item_type, include_guids=True)
+
+    def get_section_changes(self, section, updated_since=0, item_type=None,
+                            include_guids=False):
+        """
+        Request the items of a section updated since a time, bypasses the data cache
+
+        :param section: section key
+        :param updated_since: updatedAt high-water mark, 0 for all items
+        :param item_type: plex item type, None for the default type of the section
+        :param include_guids: include the external ids of the items
+        :return: tree or None if the request failed
+        """
+        options = {}
+        if updated_since:
+            options['updatedAt>>'] = int(updated_since)
+        if item_type:
+            options['type'] = str(item_type)
+        if include_guids:
+            options['includeGuids'] = 1
+
+        url = '/library/sections/%s/all' % section
+        if options:
+            url = '?'.join([url, urlencode(options)])
+
+        data = self.talk(self._update_path(url))
+        if not data:
+            return None
+        return self.process_xml(data)
+
+    def get_section_size(self, section, item_type=None):
+        """
+        :param section: section key
+        :param item_type: plex item type, None for the default type of the section
+        :return: number of items in the section or None if the request failed
+        """
+        options = {
+            'X-Plex-Container-Start': 0,
+            'X-Plex-Container-Size': 0,
+        }
+        if item_type:
+            options['type'] = str(item_type)
+
+        url = '?'.join(['/library/sections/%s/all' % section, urlencode(options)])
+
+        data = self.talk(self._update_path(url))
+        if not data:
+            return None
+
+        tree = self.process_xml(data)
+        try:
+            return int(tree.get('totalSize', tree.get('size')))
+        except (TypeError, ValueError):
+            return None
+
     def get_search(self, query, item_type, section=-1, start=0, size=0):
         if section < 0:
             return None
@@ -741,11 +967,15 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
         url = '?'.join(['/library/sections/%s/recentlyViewedShows' % section, urlencode(arguments)])
         return self.processed_xml(self._update_path(url))
 
-    def get_server_recentlyadded(self):
-        return self.get_recently_added(section=-1)
+    def get_server_recentlyadded(self, size=0, hide_watched=True, item_type=None):
+        """
+        :param item_type: plex item type, without it new episodes are grouped into seasons
+        """
+        return self.get_recently_added(section=-1, size=size, hide_watched=hide_watched,
+                                       item_type=item_type)
 
-    def get_server_ondeck(self):
-        return self.get_ondeck(section=-1)
+    def get_server_ondeck(self, size=0):
+        return self.get_ondeck(section=-1, size=size)
 
     def get_channel_recentlyviewed(self):
         return self.processed_xml(self._update_path('/channels/recentlyViewed'))
@@ -760,23 +990,191 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
 
     def processed_xml(self, url):
         cache_name = DATA_CACHE.sha512_cache_name('processed_xml', self.get_uuid(), url)
-        is_valid, result = DATA_CACHE.check_cache(cache_name, self.get_settings().data_cache_ttl())
-        if is_valid and result is not None:
-            return result
+        ttl = self.get_settings().data_cache_ttl()
+        is_valid, entry = self._read_cached_xml(cache_name, ttl)
+        if is_valid:
+            return entry['tree']
+
+        # identical requests in flight are coalesced, callers share the parsed result
+        key = (self.get_uuid(), normalize_url(url), self.get_user())
+        return SINGLE_FLIGHT.do(key, self._fetch_processed_xml, url, cache_name, ttl, entry)
+
+    def _read_cached_xml(self, cache_name, ttl):
+        """
+        Read a cached container, expired entries are kept for revalidation
+        Containers of a library section are invalid once the section revision changes,
+        containers without watch state are also kept past the ttl while it's unchanged
+
+        :param cache_name: data cache name of the container
+        :param ttl: time to live of the data cache
+        :return: tuple (is_valid, entry), entry is a dict with the tree and its validators
+        """
+        is_valid = DATA_CACHE.is_valid(cache_name, ttl)
+        if is_valid is None:
+            return False, None
+
+        data_ok, entry = DATA_CACHE.read_cache(cache_name)
+        if not data_ok or entry is None:
+            return False, None
+
+        if not isinstance(entry, dict):
+            entry = {'tree': entry}  # cached before validators were kept
+
+        if entry.get('section') and entry.get('revision'):
+            revisions = self.get_section_revisions()
+            if revisions:
+                if revisions.get(entry['section']) != entry['revision']:
+                    LOG.debug('CACHE [%s]: section revision changed' % cache_name)
+                    is_valid = False
+                elif not is_valid and entry.get('has_watch_state') is False:
+                    is_valid = bool(DATA_CACHE.is_valid(cache_name, SECTION_REVISION_MAX_AGE))
+
+        return is_valid, entry
+
+    def _fetch_processed_xml(self, url, cache_name, ttl, entry=None):
+        """
+        :param entry: the expired cache entry read by processed_xml, used for revalidation
+        """
+        lease = None
+        if DATA_CACHE.cache_location is not None:
+            # another add-on process fetching the same url will write it to the data cache
+            lease = ProcessLease(cache_name)
+            if not lease.acquire() and lease.wait():
+                is_valid, entry = self._read_cached_xml(cache_name, ttl)
+                if is_valid:
+                    return entry['tree']
+                _ = lease.acquire()
 
-        if url.startswith('http'):
-            LOG.debug('We have been passed a full URL. Parsing out path')
-            url_parts = urlparse(url)
-            url = url_parts.path
+        try:
+            validators = None
+            if entry and (entry.get('etag') or entry.get('last_modified')):
+                validators = {
+                    'etag': entry.get('etag'),
+                    'last_modified': entry.get('last_modified'),
+                }
+
+            if url.startswith('http'):
+                LOG.debug('We have been passed a full URL. Parsing out path')
+                url_parts = urlparse(url)
+                url = url_parts.path
+
+                if url_parts.query:
+                    url = '%s?%s' % (url, url_parts.query)
+
+            # the revision is read before the request, a change during the request
+            # will invalidate the entry on the next revision check
+            section, revision = self._section_revision(url)
+
+            start_time = time.time()
+            details = {}
+            data = self.talk(url, validators=validators, details=details)
+
+            if validators and details.get('status') == 304:
+                entry.update({
+                    'section': section,
+                    'revision': revision,
+                    'has_watch_state': self._has_watch_state(url, entry['tree']),
+                })
+                DATA_CACHE.write_cache(cache_name, entry)  # restart the ttl
+                self._record_revalidation(entry, time.time() - start_time)
+                return entry['tree']
+
+            tree = self.process_xml(data)
+            if tree is not None:
+                DATA_CACHE.write_cache(cache_name, {
+                    'tree': tree,
+                    'etag': details.get('etag'),
+                    'last_modified': details.get('last_modified'),
+                    'updated_at': tree.get('updatedAt'),
+                    'size': details.get('size', 0),
+                    'elapsed': time.time() - start_time,
+                    'section': section,
+                    'revision': revision,
+                    'has_watch_state': self._has_watch_state(url, tree),
+                })
+                if validators:
+                    cache_stats.record(modified=1)
+        finally:
+            if lease is not None:
+                lease.release()
 
-            if url_parts.query:
-                url = '%s?%s' % (url, url_parts.query)
-        data = self.talk(url)
-        tree = self.process_xml(data)
-        if tree is not None:
-            DATA_CACHE.write_cache(cache_name, tree)
         return tree
 
+    def _section_revisions_cache_name(self):
+        return DATA_CACHE.sha512_cache_name('section_revisions', self.get_uuid(),
+                                            str(self.get_user()))
+
+    def _section_revisions_property(self):
+        return '%s.section_revisions.%s' % (CONFIG['id'], self.get_uuid())
+
+    def _section_revisions_invalidated(self, checked):
+        invalidated = xbmcgui.Window(10000).getProperty(self._section_revisions_property())
+        try:
+            return float(invalidated) > checked
+        except ValueError:
+            return False
+
+    def invalidate_section_revisions(self):
+        """
+        Force a section revision check on the next cached container look up,
+        in this and all other add-on processes
+        """
+        LOG.debug('Invalidating section revisions for %s' % self.get_uuid())
+        SECTION_REVISIONS.pop(self.get_uuid(), None)
+        _ = DATA_CACHE.delete(self._section_revisions_cache_name())
+        xbmcgui.Window(10000).setProperty(self._section_revisions_property(), str(time.time()))
+
+    def invalidate_item(self, media_id):
+        """
+        Remove the cached metadata containers of an item
+        """
+        LOG.debug('Invalidating cached item %s on %s' % (media_id, self.get_uuid()))
+        for path in ['/library/metadata/%s', '/library/metadata/%s/children',
+                     '/library/metadata/%s/allLeaves']:
+            url = self._update_path(path % media_id)
+            _ = DATA_CACHE.delete(DATA_CACHE.sha512_cache_name('processed_xml',
+                                                               self.get_uuid(), url))
+
+    @staticmethod
+    def _has_watch_state(url, tree):
+        """
+        :param url: path of the container
+        :param tree: processed container
+        :return: True if the container changes with the watch state of its items
+        """
+        path = url.split('?', 1)[0]
+        if any(part in WATCH_STATE_PATHS for part in path.split('/')):
+            return True
+
+        if 'unwatched' in url or 'viewCount' in url or 'viewOffset' in url:
+            return True
+
+        # decided by the type, a listing without a watched item yet still has watch state
+        if tree.get('viewGroup') in WATCH_STATE_TYPES:
+            return True
+
+        return any(element.tag == 'Video' or element.get('type') in WATCH_STATE_TYPES
+                   for element in tree)
+
+    def _section_revision(self, url):
+        if DATA_CACHE.cache_location is None:
+            return None, None  # nothing is cached that the revision could invalidate
+
+        match = SECTION_PATH_RE.match(url)
+        if not match:
+            return None, None
+
+        section = match.group('section')
+        return section, self.get_section_revisions().get(section)
+
+    @staticmethod
+    def _record_revalidation(entry, elapsed):
+        bytes_saved = entry.get('size', 0)
+        seconds_saved = max(entry.get('elapsed', 0) - elapsed, 0)
+        LOG.debug('CACHE: revalidated, saved %s bytes and %.2f seconds' %
+                  (bytes_saved, seconds_saved))
+        cache_stats.record(revalidated=1, bytes_saved=bytes_saved, seconds_saved=seconds_saved)
+
     def raw_xml(self, url):
         if url.startswith('http'):
             LOG.debug('We have been passed a full URL. Parsing out path')
@@ -890,7 +1288,12 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
         }
         self.talk(self._update_path('/video/:/transcode/segmented/stop', options))
 
-    def report_playback_progress(self, media_id, watched_time, state='playing', duration=0):
+    def report_playback_progress(self, media_id, watched_time, state='playing', duration=0,
+                                 session=None):
+        """
+        :return: True if the server accepted the report
+        """
+        details = {}
         try:
             mark_watched = False
             if state == 'stopped' and int((float(watched_time) / float(duration)) * 100) >= 98:
@@ -906,27 +1309,41 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
                 'time': watched_time,
             }
 
-            self.talk(self._update_path('/:/timeline', options))
+            self.talk(self._update_path('/:/timeline', options),
+                      details=details, session=session)
 
-            if mark_watched:
-                self.mark_item_watched(media_id)
+            accepted = details.get('status') == requests.codes.ok  # pylint: disable=no-member
+            if accepted and mark_watched:
+                return self.mark_item_watched(media_id)
 
         except ZeroDivisionError:
             pass
 
+        return details.get('status') == requests.codes.ok  # pylint: disable=no-member
+
     def mark_item_watched(self, media_id):
+        """
+        :return: True if the server accepted the change
+        """
         options = {
             'key': media_id,
             'identifier': 'com.plexapp.plugins.library',
         }
-        self.talk(self._update_path('/:/scrobble', options))
+        details = {}
+        self.talk(self._update_path('/:/scrobble', options), details=details)
+        return details.get('status') == requests.codes.ok  # pylint: disable=no-member
 
     def mark_item_unwatched(self, media_id):
+        """
+        :return: True if the server accepted the change
+        """
         options = {
             'key': media_id,
             'identifier': 'com.plexapp.plugins.library',
         }
-        self.talk(self._update_path('/:/unscrobble', options))
+        details = {}
+        self.talk(self._update_path('/:/unscrobble', options), details=details)
+        return details.get('status') == requests.codes.ok  # pylint: disable=no-member
 
     def refresh_section(self, key):
         return self.talk(self._update_path('/library/sections/%s/refresh' % key))
@@ -1003,9 +1420,19 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
         return lyrics
 
     def get_universal_transcode(self, url, transcode_profile=0):
+        """
+        :param transcode_profile: index of the transcode profile, or dict of transcode settings
+                                  with the profile index and an optional max_bitrate in kbps,
+                                  the limit lowers the bitrate and resolution of the profile
+        """
         # Check for myplex user, which we need to alter to a master server
         LOG.debug('incoming URL is: %s' % url)
 
+        max_bitrate = None
+        if isinstance(transcode_profile, dict):
+            max_bitrate = transcode_profile.get('max_bitrate')
+            transcode_profile = transcode_profile.get('profile', 0)
+
         profile = self.get_settings().transcode_profile(transcode_profile)
         resolution, bitrate = profile.get('quality').split(',')
         subtitle_size = profile.get('subtitle_size').split('.')[0]
@@ -1020,6 +1447,11 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
         else:
             max_video_bitrate = 2000  # a catch all amount for missing data
 
+        if max_bitrate and max_bitrate < float(max_video_bitrate):
+            max_video_bitrate = max_bitrate
+            resolution = limited_resolution(resolution, max_bitrate)
+            bitrate = '%sKbps (limited)' % max_bitrate
+
         transcode_request = '/video/:/transcode/universal/start.m3u8'
         session = str(uuid.uuid4())
         quality = '100'
@@ -1081,3 +1513,78 @@ class PlexMediaServer:  # pylint: disable=too-many-public-methods, too-many-inst
     @staticmethod
     def _create_kodi_header(headers):
         return map(lambda x: '='.join((x[0], quote(x[1]))), headers.items())
+
+
+def limited_resolution(resolution, bitrate):
+    """
+    Lower a transcode resolution to what a bitrate can carry, see transcode_target_quality_0
+
+    :param resolution: resolution of the transcode profile ie. 1920x1080
+    :param bitrate: bitrate in kbps
+    :return: resolution
+    """
+    for min_bitrate, limited in TRANSCODE_RESOLUTIONS:
+        if bitrate >= min_bitrate:
+            break
+
+    try:
+        if int(limited.split('x', 1)[0]) < int(resolution.split('x', 1)[0]):
+            return limited
+    except ValueError:
+        pass
+
+    return resolution
+
+
+def address_match(addresses, scheme, ipaddress, port):
+    """
+    Check if an address belongs to a server
+
+    :param addresses: server addresses, see PlexMediaServer.get_addresses
+    :param scheme: scheme of the address ie. http, https
+    :param ipaddress: ip address or host name
+    :param port: port of the address
+    :return: True if the address matches one of the server addresses
+    """
+    if not port:
+        port = ''
+
+    access_uri = addresses['access_uri']
+    access_address = addresses['access_address']
+    external_address = addresses['external_address']
+
+    LOG.debug('Checking [%s://%s%s] against [%s]' %
+              (scheme, ipaddress, '' if not port else ':' + port, access_uri))
+    uri = '%s://%s' % (scheme, ipaddress)
+    uri += ':' + port if port else ''
+    if access_uri.startswith(uri) and uri.count(':') == access_uri.count(':'):
+        return True
+
+    LOG.debug('Checking [%s:%s] against [%s]' % (ipaddress, port, access_address))
+    if '%s:%s' % (ipaddress, port) == access_address:
+        return True
+
+    LOG.debug('Checking [%s:%s] against [%s]' % (ipaddress, port, external_address))
+    if '%s:%s' % (ipaddress, port) == external_address:
+        return True
+
+    for test_address in addresses['local_address']:
+        LOG.debug('Checking [%s:%s] against [%s:%s]' % (ipaddress, port, ipaddress, 32400))
+        if '%s:%s' % (ipaddress, port) == '%s:%s' % (test_address, 32400):
+            return True
+
+    return False
+
+
+def normalize_url(url):
+    """
+    Normalize a url for comparison, the path and the query with sorted parameters
+
+    :param url: full url or path
+    :return: path and sorted query
+    """
+    url_parts = urlparse(url)
+    query = urlencode(sorted(parse_qsl(url_parts.query, keep_blank_values=True)))
+    if query:
+        return '%s?%s' % (url_parts.path, query)
+    return url_parts.path
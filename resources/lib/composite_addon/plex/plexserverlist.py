@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2020 Composite (plugin.video.composite_for_plex)
+
+    This file is part of Composite (plugin.video.composite_for_plex)
+
+    SPDX-License-Identifier: GPL-2.0-or-later
+    See LICENSES/GPL-2.0-or-later.txt for more information.
+"""
+
+from six import iteritems
+from six.moves.urllib_parse import urlparse
+
+from ..addon.logger import Logger
+
+LOG = Logger('plexserverlist')
+
+# bump when the snapshot entries change, older snapshots will trigger a discovery
+SNAPSHOT_VERSION = 2
+
+
+class PlexServerList:
+    """
+    Server list backed by a compact snapshot holding only the fields required for routing,
+    PlexMediaServer objects are read from their own cache file on first use
+    """
+
+    def __init__(self, cache, servers=None):
+        self.cache = cache
+        self._entries = {}
+        self._servers = {}
+        # address index, keys from address_keys() to server uuid
+        self._index = {}
+
+        if servers:
+            for server_uuid, server in iteritems(servers):
+                self[server_uuid] = server
+
+    @staticmethod
+    def server_cache_name(server_uuid):
+        return 'plex_server_%s.cache' % server_uuid
+
+    @staticmethod
+    def create_entry(server):
+        return {
+            'name': server.get_name(),
+            'revision': server.get_revision(),
+            'user': server.get_user(),
+            'addresses': server.get_addresses(),
+        }
+
+    def load_snapshot(self, snapshot, ttl=3600):
+        """
+        Load the server list from a snapshot, servers are hydrated on first use
+
+        :param snapshot: snapshot created by PlexServerList.snapshot
+        :param ttl: time to live of the server cache files
+        :return: True if the snapshot is current and all server cache files are valid
+        """
+        self._entries = {}
+        self._servers = {}
+        self._index = {}
+
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+            LOG.debug('Server list snapshot version mismatch')
+            return False
+
+        entries = snapshot.get('servers', {})
+        for server_uuid in entries:
+            if not self.cache.is_valid(self.server_cache_name(server_uuid), ttl):
+                LOG.debug('Server cache for %s is missing or too old' % server_uuid)
+                return False
+
+        self._entries = entries
+        self._build_index()
+        return True
+
+    def snapshot(self):
+        for server_uuid, server in iteritems(self._servers):
+            self._entries[server_uuid] = self.create_entry(server)
+
+        return {
+            'version': SNAPSHOT_VERSION,
+            'servers': self._entries,
+        }
+
+    def save(self, cache_name):
+        for server_uuid, server in iteritems(self._servers):
+            server.settings = None  # can't pickle xbmcaddon.Addon()
+            self.cache.write_cache(self.server_cache_name(server_uuid), server)
+
+        self.cache.write_cache(cache_name, self.snapshot())
+
+    def entries(self):
+        """
+        :return: list of tuples (uuid, entry), does not hydrate the servers
+        """
+        return list(self._entries.items())
+
+    def is_hydrated(self, server_uuid):
+        return server_uuid in self._servers
+
+    def hydrate(self, server_uuid):
+        if server_uuid not in self._entries:
+            raise KeyError(server_uuid)
+
+        LOG.debug('Hydrating server %s' % server_uuid)
+        data_ok, server = self.cache.read_cache(self.server_cache_name(server_uuid))
+        if not data_ok or server is None:
+            LOG.debug('Unable to hydrate server %s, removing it' % server_uuid)
+            self._unindex(server_uuid)
+            del self._entries[server_uuid]
+            raise KeyError(server_uuid)
+
+        self._servers[server_uuid] = server
+        return server
+
+    def find(self, scheme, host, port):
+        """
+        Find the server an address belongs to using the address index
+
+        :param scheme: scheme of the address ie. http, https
+        :param host: ip address or host name
+        :param port: port of the address
+        :return: server uuid or None if no server matched
+        """
+        if not port:
+            port = ''
+
+        server_uuid = self._index.get(('uri', scheme, host.lower(), str(port)))
+        if server_uuid is None:
+            server_uuid = self._index.get(('address', '%s:%s' % (host, port)))
+
+        return server_uuid
+
+    def _build_index(self):
+        self._index = {}
+        for server_uuid, entry in iteritems(self._entries):
+            self._index_entry(server_uuid, entry)
+
+    def _index_entry(self, server_uuid, entry):
+        for key in address_keys(entry['addresses']):
+            # first server wins, matches the order servers were checked in
+            self._index.setdefault(key, server_uuid)
+
+    def _unindex(self, server_uuid):
+        for key in [key for key, value in iteritems(self._index) if value == server_uuid]:
+            del self._index[key]
+
+    def get(self, server_uuid, default=None):
+        try:
+            return self[server_uuid]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    def values(self):
+        return [server for _, server in self.items()]
+
+    def items(self):
+        servers = []
+        for server_uuid in self.keys():
+            server = self.get(server_uuid)
+            if server is not None:
+                servers.append((server_uuid, server))
+        return servers
+
+    def __getitem__(self, server_uuid):
+        server = self._servers.get(server_uuid)
+        if server is None:
+            server = self.hydrate(server_uuid)
+        return server
+
+    def __setitem__(self, server_uuid, server):
+        self._servers[server_uuid] = server
+        self._entries[server_uuid] = self.create_entry(server)
+        self._unindex(server_uuid)
+        self._index_entry(server_uuid, self._entries[server_uuid])
+
+    def __delitem__(self, server_uuid):
+        self._servers.pop(server_uuid, None)
+        self._unindex(server_uuid)
+        del self._entries[server_uuid]
+
+    def __contains__(self, server_uuid):
+        return server_uuid in self._entries
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __bool__(self):
+        return bool(self._entries)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return repr(dict((server_uuid, entry['name'])
+                         for server_uuid, entry in self._entries.items()))
+
+
+def _uri_key(url):
+    try:
+        parsed_url = urlparse(url)
+        port = parsed_url.port
+    except ValueError:
+        return None
+
+    if not parsed_url.scheme or not parsed_url.hostname:
+        return None
+
+    return 'uri', parsed_url.scheme, parsed_url.hostname.lower(), str(port or '')
+
+
+def address_keys(addresses):
+    """
+    Create the address index keys for a server, the keys cover the same addresses
+    as plexserver.address_match, plus the custom access urls
+
+    :param addresses: server addresses, see PlexMediaServer.get_addresses
+    :return: list of index keys
+    """
+    keys = []
+
+    for url in [addresses['access_uri']] + addresses.get('custom_access_urls', []):
+        key = _uri_key(url)
+        if key:
+            keys.append(key)
+
+    keys.append(('address', addresses['access_address']))
+
+    if addresses['external_address']:
+        keys.append(('address', addresses['external_address']))
+
+    for local_address in addresses['local_address']:
+        keys.append(('address', '%s:%s' % (local_address, 32400)))
+
+    return keys
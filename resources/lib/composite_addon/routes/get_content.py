@@ -19,6 +19,8 @@ from kodi_six import xbmcplugin  # pylint: disable=import-error
 from ..addon.common import get_handle
 from ..addon.constants import MODES
 from ..addon.logger import Logger
+from ..addon.processing import episodes
+from ..addon.processing import movies
 from ..addon.processing.albums import process_albums
 from ..addon.processing.artists import process_artists
 from ..addon.processing.directories import process_directories
@@ -99,6 +101,37 @@ def _get_url(server, mode, url):
     return url
 
 
+def list_widget_items(context, server_uuid, mode, url):
+    """
+    Create the items of a widget listing without rendering them, used for the widget store
+
+    :param context: context object
+    :param server_uuid: uuid of the server
+    :param mode: one of the TXT_* widget modes
+    :param url: section path
+    :return: tuple (content type, sort methods, items) or None if the listing isn't a
+             movie or episode listing
+    """
+    server = context.plex_network.get_server_from_uuid(server_uuid)
+    url = _get_url(server, mode, url)
+
+    # server messages are shown by the live fetch, not while the service creates the listing
+    tree = get_xml(context, url, quiet=True)
+    if tree is None:
+        return None
+
+    view_group = tree.get('viewGroup')
+    if view_group == 'movie':
+        content_type, items = movies.create_movie_items(context, server, url, tree)
+        return content_type, movies.get_sort_methods(url, content_type), items
+
+    if view_group == 'episode':
+        items = episodes.create_episode_items(context, server, url, tree)
+        return 'episodes', episodes.get_sort_methods(context, tree), items
+
+    return None
+
+
 def search(url):
     keyboard = xbmc.Keyboard('', i18n('Search...'))
     keyboard.setHeading(i18n('Enter search term'))
@@ -12,6 +12,7 @@
 from kodi_six import xbmcgui  # pylint: disable=import-error
 from kodi_six import xbmcplugin  # pylint: disable=import-error
 
+from ..addon import library_sync
 from ..addon.common import get_handle
 from ..addon.containers import Item
 from ..addon.items.movie import create_movie_item
@@ -33,8 +34,12 @@ def run(context):
         context.plex_network = plex.Plex(context.settings, load=True)
         server = context.plex_network.get_server_from_url(context.params.get('url'))
         if server:
-            tree = server.processed_xml(context.params.get('url'))
-            exists = tree is not None and not tree.get('message') and tree.get('size', '0') != '0'
+            # answered from the synced sections when possible, saves a request per item
+            exists = library_sync.contains(server.get_uuid(), context.params.get('url'))
+            if exists is None:
+                tree = server.processed_xml(context.params.get('url'))
+                exists = (tree is not None and not tree.get('message') and
+                          tree.get('size', '0') != '0')
         LOG.debug('check_exists for %s -> %s' % (context.params.get('url'), exists))
         xbmcplugin.setResolvedUrl(get_handle(), exists, xbmcgui.ListItem())
 
@@ -75,9 +80,10 @@ def run(context):
                 if section.get_type() in content_type:
                     if content_type in ['movies', 'tvshows']:
                         set_content(get_handle(), content_type)
-                        _list_content(context, server,
-                                      server.join_url(server.get_url_location(),
-                                                      section.get_path(), 'all'))
+                        url = server.join_url(server.get_url_location(),
+                                              section.get_path(), 'all')
+                        tree = library_sync.sync(server, section.get_key())
+                        _list_content(context, server, url, tree)
 
         xbmcplugin.endOfDirectory(get_handle(), cacheToDisc=False)
 
@@ -92,8 +98,9 @@ def _get_content_type(path_mode):
     return content_type
 
 
-def _list_content(context, server, url):
-    tree = server.processed_xml(url)
+def _list_content(context, server, url, tree=None):
+    if tree is None:
+        tree = server.processed_xml(url)
     if tree is None:
         return
 
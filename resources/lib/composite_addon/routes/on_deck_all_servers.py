@@ -16,6 +16,8 @@ from ..addon.containers import Item
 from ..addon.items.episode import create_episode_item
 from ..addon.items.movie import create_movie_item
 from ..addon.logger import Logger
+from ..addon.utils import merge_top
+from ..addon.utils import partition_by_section
 from ..plex import plex
 
 LOG = Logger()
@@ -24,36 +26,68 @@ LOG = Logger()
 def run(context):
     context.plex_network = plex.Plex(context.settings, load=True)
     content_type = context.params.get('content_type')
+
+    items = list_items(context, content_type)
+
+    if items:
+        xbmcplugin.setContent(get_handle(), content_type)
+        xbmcplugin.addDirectoryItems(get_handle(), items, len(items))
+
+    xbmcplugin.endOfDirectory(get_handle(), cacheToDisc=False)
+
+
+def list_items(context, content_type):
     server_list = context.plex_network.get_server_list()
 
-    items = []
+    candidates = []
     LOG.debug('Using list of %s servers: %s' % (len(server_list), server_list))
     for server in server_list:
         sections = server.get_sections()
+        if context.settings.per_server_hubs():
+            section_keys = [int(section.get_key()) for section in sections
+                            if section.content_type() == content_type]
+            if section_keys:
+                candidates += _list_server_content(server, section_keys)
+            continue
+
         for section in sections:
             if section.content_type() == content_type:
-                items += _list_content(context, server, int(section.get_key()))
+                candidates += _list_content(server, int(section.get_key()))
 
-    if items:
-        xbmcplugin.setContent(get_handle(), content_type)
-        xbmcplugin.addDirectoryItems(get_handle(), items, len(items))
-
-    xbmcplugin.endOfDirectory(get_handle(), cacheToDisc=False)
+    # order all servers together, only the winners are turned into items
+    candidates = merge_top(candidates, context.settings.all_servers_item_count(),
+                           ('lastViewedAt', 'addedAt'))
+    return _create_items(context, candidates)
 
 
-def _list_content(context, server, section):
+def _list_content(server, section):
     tree = server.get_ondeck(section=section)
     if tree is None:
         return []
 
-    branches = tree.getiterator('Video')
-    if not branches:
+    return [(server, tree, branch) for branch in tree.getiterator('Video')]
+
+
+def _list_server_content(server, section_keys):
+    """
+    List the on deck items of the sections with a single server-wide request
+
+    :param server: server object
+    :param section_keys: keys of the sections to list
+    :return: list of tuples (server, tree, video)
+    """
+    tree = server.get_server_ondeck()
+    if tree is None:
         return []
 
+    return [(server, tree, branch) for branch in partition_by_section(tree, section_keys)]
+
+
+def _create_items(context, candidates):
     items = []
     append_item = items.append
 
-    for content in branches:
+    for server, tree, content in candidates:
         item = Item(server, server.get_url_location(), tree, content)
         if content.get('type') == 'episode':
             append_item(create_episode_item(context, item))
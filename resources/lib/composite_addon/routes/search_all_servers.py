@@ -22,6 +22,7 @@ from ..addon.items.movie import create_movie_item
 from ..addon.items.show import create_show_item
 from ..addon.items.track import create_track_item
 from ..addon.logger import Logger
+from ..addon.search_index import SearchIndex
 from ..addon.strings import i18n
 from ..plex import plex
 
@@ -184,13 +185,22 @@ def search(context, sections):
     results = []
     section_type = get_section_type(context)
 
+    # indexed sections are answered locally, the others are searched on the server
+    search_index = SearchIndex() if context.settings.search_index() else None
+
     for section in sections:
         if section.get_type() == section_type:
-            results += _list_content(
-                context,
-                context.plex_network.get_server_from_uuid(section.get_server_uuid()),
-                section.get_path()
-            )
+            server = context.plex_network.get_server_from_uuid(section.get_server_uuid())
+
+            if search_index is not None:
+                indexed = search_index.search(server, _get_section_id(section.get_path()),
+                                              context.params['query'], get_item_type(context))
+                if indexed is not None:
+                    container, branches = indexed
+                    results += _create_items(context, server, container, branches)
+                    continue
+
+            results += _list_content(context, server, section.get_path())
 
     return results
 
@@ -210,8 +220,12 @@ def _get_search_query():
     return text.strip()
 
 
+def _get_section_id(section_path):
+    return [int(part) for part in section_path.split('/') if part.isdigit()][0]
+
+
 def _list_content(context, server, section):
-    section_id = [int(part) for part in section.split('/') if part.isdigit()][0]
+    section_id = _get_section_id(section)
     item_type = get_item_type(context)
 
     tree = server.get_search(context.params['query'], item_type, section=section_id)
@@ -228,6 +242,10 @@ def _list_content(context, server, section):
     }
 
     branches = tree.getiterator(iter_types.get(item_type, 'Directory'))
+    return _create_items(context, server, tree, branches)
+
+
+def _create_items(context, server, tree, branches):
     if not branches:
         return []
 
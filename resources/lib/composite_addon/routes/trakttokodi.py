@@ -10,9 +10,11 @@
 """
 
 import string
+import threading
 import xml.etree.ElementTree as ETree
 
 from six import PY3
+from six.moves import queue
 from six.moves.urllib_parse import unquote
 
 from kodi_six import xbmc  # pylint: disable=import-error
@@ -24,6 +26,7 @@ from ..addon.constants import MODES
 from ..addon.logger import Logger
 from ..addon.processing.episodes import process_episodes
 from ..addon.processing.seasons import process_seasons
+from ..addon.search_index import SearchIndex
 from ..addon.strings import decode_utf8
 from ..addon.utils import jsonrpc_play
 from ..addon.utils import wait_for_busy_dialog
@@ -31,6 +34,9 @@ from ..plex import plex
 
 LOG = Logger()
 
+# searches of sections in flight at the same time
+SEARCH_CONCURRENCY = 4
+
 
 def run(context):
     context.plex_network = plex.Plex(context.settings, load=True)
@@ -43,11 +49,17 @@ def run(context):
     # possible params ['video_type', 'title', 'year', 'trakt_id', 'episode_id', 'season_id',
     # 'season', 'episode', 'ep_title', 'imdb_id', 'tmdb_id', 'tvdb_id']
 
-    search_results = search(context)
-    log_results = list(map(lambda x: decode_utf8(ETree.tostring(x[1])), search_results))
-    LOG.debug('Found search results: %s' % '\n\n'.join(log_results))
+    server_uuid, media_id = None, None
+    if context.settings.search_index():
+        server_uuid, media_id = find_indexed(context)
+
+    if not server_uuid or not media_id:
+        search_results = search(context)
+        log_results = list(map(lambda x: decode_utf8(ETree.tostring(x[1])), search_results))
+        LOG.debug('Found search results: %s' % '\n\n'.join(log_results))
+
+        server_uuid, media_id = get_server_uuid_and_media_id(context.params, search_results)
 
-    server_uuid, media_id = get_server_uuid_and_media_id(context.params, search_results)
     if server_uuid and media_id:
         LOG.debug('Found a server with the requested content @ server_uuid=%s w/ media_id=%s' %
                   (server_uuid, media_id))
@@ -146,7 +158,7 @@ def _get_search_type(video_type):
     return search_type
 
 
-def _get_search_results(context, server, processed):
+def _get_search_results(context, server, processed, cancelled):
     server_uuid = server.get_uuid()
 
     results = []
@@ -161,10 +173,10 @@ def _get_search_results(context, server, processed):
 
     if context.params.get('video_type') in ['episode', 'season']:
         show = _get_show(context.params, processed)
-        if show is not None:
+        if show is not None and not cancelled():
 
             season = _get_season(context.params, server, show.get('ratingKey'))
-            if season is not None:
+            if season is not None and not cancelled():
                 if context.params.get('video_type') == 'season':
                     append_result((server_uuid, season))
                     return results
@@ -180,7 +192,78 @@ def _get_search_results(context, server, processed):
     return results
 
 
+def _get_external_ids(params):
+    ids = []
+    for source in ['imdb', 'tmdb', 'tvdb']:
+        external_id = params.get('%s_id' % source)
+        if external_id:
+            ids.append((source, unquote(external_id)))
+    return ids
+
+
+def find_indexed(context):
+    """
+    Find the requested content by its external ids in the search index
+
+    :param context: context object
+    :return: tuple (server uuid, media id) or (None, None) if the content isn't indexed
+    """
+    ids = _get_external_ids(context.params)
+    content_type = _get_content_type(context.params.get('video_type'))
+    if not ids or not content_type:
+        return None, None
+
+    season = None
+    episode = None
+    if context.params.get('video_type') in ['season', 'episode']:
+        season = context.params.get('season')
+    if context.params.get('video_type') == 'episode':
+        episode = context.params.get('episode')
+
+    search_index = SearchIndex()
+    for server in context.plex_network.get_server_list():
+        for section in server.get_sections():
+            if section.get_type() != content_type:
+                continue
+
+            media_id = search_index.find(server, section.get_key(), ids, season, episode)
+            if media_id:
+                LOG.debug('Found %s in the search index' % str(ids))
+                return server.get_uuid(), media_id
+
+    return None, None
+
+
+def _search_section(context, server, section, search_type, cancelled):
+    params = context.params
+
+    title = params.get('ep_title') if search_type == '4' else params.get('title')
+    url = '%s/search?type=%s&query=%s' % (section.get_path(), search_type, title)
+    processed = server.processed_xml(url)
+
+    if not _is_not_none(processed) and params.get('video_type') == 'episode':
+        if cancelled():
+            return []
+        url = '%s/search?type=%s&query=%s' % (section.get_path(), '2', params.get('title'))
+        processed = server.processed_xml(url)
+
+    if not _is_not_none(processed) or cancelled():
+        return []
+
+    return _get_search_results(context, server, processed, cancelled)
+
+
 def search(context):
+    """
+    Search all sections of all servers with up to SEARCH_CONCURRENCY requests in flight,
+    the search ends as soon as a section returns a confirmed match,
+    see get_server_uuid_and_media_id
+    The order of the results follows the order the sections respond in and isn't
+    deterministic, only the confirmed match is always first
+
+    :param context: context object
+    :return: list of tuples (server uuid, element), the confirmed match first
+    """
     results = []
 
     content_type = _get_content_type(context.params.get('video_type'))
@@ -188,30 +271,55 @@ def search(context):
     if not content_type or not search_type:
         return []
 
-    server_list = context.plex_network.get_server_list()
-    params = context.params
-
-    for server in server_list:
-        processed_xml = server.processed_xml
-
-        sections = server.get_sections()
-        for section in sections:
-
+    tasks = queue.Queue()
+    for server in context.plex_network.get_server_list():
+        for section in server.get_sections():
             if section.get_type() == content_type:
-                title = params.get('ep_title') if search_type == '4' \
-                    else params.get('title')
-                url = '%s/search?type=%s&query=%s' % (section.get_path(), search_type, title)
-                processed = processed_xml(url)
+                tasks.put((server, section))
 
-                if not _is_not_none(processed) and params.get('video_type') == 'episode':
-                    url = '%s/search?type=%s&query=%s' % \
-                          (section.get_path(), '2', params.get('title'))
-                    processed = processed_xml(url)
+    found = threading.Event()
+    lock = threading.Lock()
 
-                if _is_not_none(processed):
-                    results += _get_search_results(context, server, processed)
+    def _search():
+        while not found.is_set():
+            try:
+                server, section = tasks.get_nowait()
+            except queue.Empty:
+                return
 
-    return results
+            try:
+                section_results = _search_section(context, server, section, search_type,
+                                                  found.is_set)
+            except Exception as error:  # pylint: disable=broad-except
+                LOG.debug('Search of %s on %s failed [%s]' %
+                          (section.get_path(), server.get_uuid(), error))
+                continue
+
+            _, media_id = get_server_uuid_and_media_id(context.params, section_results)
+            with lock:
+                if media_id and not found.is_set():
+                    # the confirmed match goes first, outstanding searches are abandoned
+                    matches = [result for result in section_results
+                               if result[1].get('ratingKey') == media_id]
+                    results[:0] = matches
+                    results.extend(result for result in section_results
+                                   if result not in matches)
+                    found.set()
+                else:
+                    results.extend(section_results)
+
+    threads = []
+    for _ in range(min(SEARCH_CONCURRENCY, tasks.qsize())):
+        thread = threading.Thread(target=_search)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    while not found.is_set() and any(thread.is_alive() for thread in threads):
+        found.wait(0.1)
+
+    with lock:
+        return list(results)
 
 
 def _compare_titles(plex_title, trakt_title):
@@ -15,6 +15,7 @@ from kodi_six import xbmc  # pylint: disable=import-error
 from ..addon.common import get_argv
 from ..addon.data_cache import DATA_CACHE
 from ..addon.logger import Logger
+from ..addon.outbox import OutboxStore
 from ..plex import plex
 
 LOG = Logger()
@@ -37,10 +38,14 @@ def run(context):
 
     if watch_status == 'watch':
         LOG.debug('Marking %s as watched' % metadata_id)
-        server.mark_item_watched(metadata_id)
+        sent = server.mark_item_watched(metadata_id)
     else:
         LOG.debug('Marking %s as unwatched' % metadata_id)
-        server.mark_item_unwatched(metadata_id)
+        sent = server.mark_item_unwatched(metadata_id)
+
+    if not sent:
+        # the service sends the change when the server is back online
+        OutboxStore().record_watched(server.get_uuid(), metadata_id, watch_status == 'watch')
 
     DATA_CACHE.delete_cache(True)
 
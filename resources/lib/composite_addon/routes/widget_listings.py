@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2020 Composite (plugin.video.composite_for_plex)
+
+    This file is part of Composite (plugin.video.composite_for_plex)
+
+    SPDX-License-Identifier: GPL-2.0-or-later
+    See LICENSES/GPL-2.0-or-later.txt for more information.
+"""
+
+import threading
+import time
+
+from six.moves.urllib_parse import urlencode
+
+from kodi_six import xbmcplugin  # pylint: disable=import-error
+
+from ..addon.cache_control import CacheControl
+from ..addon.common import get_handle
+from ..addon.constants import MODES
+from ..addon.containers import Context
+from ..addon.data_cache import DATA_CACHE
+from ..addon.items.gui import create_list_item
+from ..addon.logger import Logger
+from ..addon.strings import current_language
+from . import get_content
+from . import on_deck_all_servers
+from . import recently_added_all_servers
+from . import widgets
+
+LOG = Logger('widget_listings')
+
+# seconds between background refreshes of the registered widget listings
+REFRESH_INTERVAL = 300
+# listings older than this are not served, the plugin falls through to a live fetch
+MAX_AGE = 3 * REFRESH_INTERVAL
+
+# listings and registrations are kept apart from the data cache, which is cleared after
+# playback and other changes, one file per registered listing
+WIDGET_CACHE = CacheControl('widgets')
+REGISTRY_SUFFIX = '.request'
+# registrations are rewritten at most this often when their listing is served
+REGISTRATION_TOUCH_INTERVAL = 24 * 3600
+# registrations, and their listings, not served for this long are removed
+REGISTRATION_MAX_AGE = 7 * 24 * 3600
+# written to the data cache by every refresh, missing once the data cache was cleared
+DATA_CACHE_MARKER = 'widget_listings.cache'
+# parameters identifying a widget listing
+REQUEST_PARAMETERS = ('mode', 'url', 'server_uuid')
+
+ALL_SERVER_MODES = {
+    str(MODES.TVSHOWS_ON_DECK): (on_deck_all_servers, 'tvshows'),
+    str(MODES.MOVIES_ON_DECK): (on_deck_all_servers, 'movies'),
+    str(MODES.EPISODES_RECENTLY_ADDED): (recently_added_all_servers, 'tvshows'),
+    str(MODES.MOVIES_RECENTLY_ADDED): (recently_added_all_servers, 'movies'),
+}
+
+
+def request_params(params):
+    """
+    :param params: plugin parameters
+    :return: dict, the parameters identifying the widget listing
+    """
+    return dict((key, str(params[key])) for key in REQUEST_PARAMETERS if params.get(key))
+
+
+def _cache_name(request):
+    return WIDGET_CACHE.sha512_cache_name('widget', '', urlencode(sorted(request.items())))
+
+
+def _registry_name(request):
+    return _cache_name(request)[:-len('.cache')] + REGISTRY_SUFFIX
+
+
+def serve(context):
+    """
+    Render a widget listing from the store, unknown listings are registered
+    for the service to refresh
+
+    :param context: context object
+    :return: True if the listing was rendered from the store, False to use a live fetch
+    """
+    request = request_params(context.params)
+    register(request)
+
+    if stale():
+        return False
+
+    is_valid, listing = WIDGET_CACHE.check_cache(_cache_name(request), MAX_AGE)
+    if is_valid and listing and listing.get('language') == current_language():
+        LOG.debug('Serving widget listing |%s| from the store' % request)
+        render(listing)
+        return True
+
+    return False
+
+
+def stale():
+    """
+    :return: True if the data cache was cleared since the last refresh, the stored
+             listings may show outdated watch states until they are refreshed
+    """
+    if DATA_CACHE.cache_location is None:
+        return False
+    return DATA_CACHE.is_valid(DATA_CACHE_MARKER) is None
+
+
+def render(listing):
+    if listing['content_type']:
+        xbmcplugin.setContent(get_handle(), listing['content_type'])
+
+    for sort_method in listing['sort_methods']:
+        xbmcplugin.addSortMethod(get_handle(), sort_method)
+
+    items = [create_list_item(payload) for payload in listing['items']]
+    if items:
+        xbmcplugin.addDirectoryItems(get_handle(), items, len(items))
+
+    xbmcplugin.endOfDirectory(get_handle(), cacheToDisc=False)
+
+
+def registered():
+    """
+    :return: dict of listing cache name to the parameters identifying the widget listing
+    """
+    requests = {}
+    for registry_name in WIDGET_CACHE.list_cache(REGISTRY_SUFFIX):
+        _, request = WIDGET_CACHE.read_cache(registry_name)
+        if request:
+            requests[_cache_name(request)] = request
+    return requests
+
+
+def register(request):
+    registry_name = _registry_name(request)
+    if WIDGET_CACHE.is_valid(registry_name, REGISTRATION_TOUCH_INTERVAL):
+        return  # registered and recently served
+
+    LOG.debug('Registering widget listing |%s|' % request)
+    WIDGET_CACHE.write_cache(registry_name, request)
+
+
+def build(context, request):
+    """
+    Create a widget listing with ready to render item payloads
+
+    :param context: context object, with payloads enabled
+    :param request: parameters identifying the widget listing, see request_params
+    :return: dict or None if the listing can only be fetched live
+    """
+    mode = request.get('mode')
+
+    if mode in ALL_SERVER_MODES:
+        route, content_type = ALL_SERVER_MODES[mode]
+        sort_methods = []
+        items = route.list_items(context, content_type)
+
+    elif mode == str(MODES.WIDGETS):
+        content_type = None
+        sort_methods = []
+        items = widgets.list_items(context, request.get('url'))
+
+    else:
+        listing = get_content.list_widget_items(context, request.get('server_uuid'),
+                                                mode, request.get('url'))
+        if listing is None:
+            return None
+        content_type, sort_methods, items = listing
+
+    return {
+        'content_type': content_type,
+        'sort_methods': sort_methods,
+        'items': items,
+        'language': current_language(),
+        'created': time.time(),
+    }
+
+
+def refresh(settings, plex_network, stopped=None):
+    """
+    Refresh all registered widget listings, used by the service
+
+    :param settings: settings object
+    :param plex_network: plex network object
+    :param stopped: callable, returns True when the refresh should stop
+    """
+    expired = WIDGET_CACHE.delete_expired(REGISTRATION_MAX_AGE)
+    if expired:
+        LOG.debug('Removed %s widget files that were not served recently' % expired)
+
+    # written first, clearing the data cache during the refresh flags the listings stale again
+    DATA_CACHE.write_cache(DATA_CACHE_MARKER, {'created': time.time()})
+
+    requests = registered()
+    if not requests:
+        return
+
+    for cache_name, request in requests.items():
+        if stopped is not None and stopped():
+            break
+
+        context = Context()
+        context.settings = settings
+        context.plex_network = plex_network
+        context.payloads = True
+        context.params = dict(request)
+
+        try:
+            listing = build(context, request)
+        except Exception as error:  # pylint: disable=broad-except
+            LOG.debug('Unable to refresh widget listing |%s| [%s]' % (request, error))
+            continue
+
+        if listing is None:
+            LOG.debug('Widget listing |%s| is served live' % request)
+            continue
+
+        WIDGET_CACHE.write_cache(cache_name, listing)
+        LOG.debug('Refreshed widget listing |%s| with %s items' %
+                  (request, len(listing['items'])))
+
+
+class WidgetRefreshThread(threading.Thread):
+    """
+    Refresh the registered widget listings once, used by the service
+    """
+    LOG = Logger('WidgetRefreshThread')
+
+    def __init__(self, settings, plex_network):
+        super(WidgetRefreshThread, self).__init__()  # pylint: disable=super-with-arguments
+        self._stopped = threading.Event()
+        self._ended = threading.Event()
+
+        self.settings = settings
+        self.plex_network = plex_network
+
+        self.daemon = True
+        self.start()
+
+    def stop(self):
+        self.LOG.debug('Stop event set...')
+        self._stopped.set()
+
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def end(self):
+        self.LOG.debug('End event set...')
+        self._ended.set()
+
+    def ended(self):
+        return self._ended.is_set()
+
+    def run(self):
+        try:
+            refresh(self.settings, self.plex_network, self.stopped)
+        except Exception as error:  # pylint: disable=broad-except
+            self.LOG.error('Widget refresh failed [%s]' % error)
+
+        self.end()
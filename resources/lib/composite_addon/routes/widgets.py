@@ -21,6 +21,16 @@ from ..plex import plex
 
 def run(context, url):
     context.plex_network = plex.Plex(context.settings, load=True)
+
+    items = list_items(context, url)
+
+    if items:
+        xbmcplugin.addDirectoryItems(get_handle(), items, len(items))
+
+    xbmcplugin.endOfDirectory(get_handle(), cacheToDisc=context.settings.cache_directory())
+
+
+def list_items(context, url):
     server = context.plex_network.get_server_from_url(url)
 
     sections = server.get_sections()
@@ -36,10 +46,7 @@ def run(context, url):
     if items:
         items += all_server_widgets(context)
 
-    if items:
-        xbmcplugin.addDirectoryItems(get_handle(), items, len(items))
-
-    xbmcplugin.endOfDirectory(get_handle(), cacheToDisc=context.settings.cache_directory())
+    return items
 
 
 def movie_widgets(context, server, section):
@@ -9,17 +9,147 @@
     See LICENSES/GPL-2.0-or-later.txt for more information.
 """
 
+import time
+
 from kodi_six import xbmcgui  # pylint: disable=import-error
 
+from .addon import cache_stats
+from .addon.cache_stats import FLUSH_INTERVAL as CACHE_STATS_FLUSH_INTERVAL
+from .addon.data_cache import DATA_CACHE
 from .addon.logger import Logger
 from .addon.monitor import Monitor
+from .addon.outbox import FLUSH_INTERVAL as OUTBOX_FLUSH_INTERVAL
+from .addon.outbox import OutboxStore
+from .addon.outbox import flush as flush_outbox
 from .addon.player import CallbackPlayer
+from .addon.search_index import UPDATE_INTERVAL as SEARCH_INDEX_INTERVAL
+from .addon.search_index import SearchIndexThread
 from .addon.settings import AddonSettings
+from .addon.strings import preload
 from .companion import companion
 from .companion.client import get_client
+from .plex.plex import Plex
+from .plex.plexnotifications import NotificationListeners
+from .plex.plexserver import SECTION_REVISION_MAX_AGE
+from .routes.widget_listings import REFRESH_INTERVAL as WIDGET_REFRESH_INTERVAL
+from .routes.widget_listings import WidgetRefreshThread
+from .routes.widget_listings import stale as widget_listings_stale
 
 LOG = Logger('service')
 
+# seconds between deletions of expired data cache files
+CACHE_SWEEP_INTERVAL = 3600
+# seconds between reloads of the server list shared by the service tasks
+PLEX_NETWORK_INTERVAL = 300
+# seconds between attempts to start the notification listeners
+NOTIFICATION_INTERVAL = 300
+
+
+class ServiceTasks:
+    """
+    Periodic tasks of the service, they share one plex network object
+    """
+
+    def __init__(self, settings, window):
+        self.settings = settings
+        self.notification_listeners = NotificationListeners(window)
+        self.widget_thread = None
+        self.search_index_thread = None
+        self._plex_network = None
+        # time of the last run of each task
+        self._last = {
+            'cache_stats': time.time(),
+            'cache_sweep': 0,
+            'notifications': 0,
+            'outbox': 0,
+            'plex_network': 0,
+            'search_index': 0,
+            'widgets': 0,
+        }
+
+    def _due(self, task, interval):
+        if time.time() - self._last[task] > interval:
+            self._last[task] = time.time()
+            return True
+        return False
+
+    def plex_network(self):
+        """
+        :return: plex network object, replaced every PLEX_NETWORK_INTERVAL to pick up
+                 servers discovered by the plugin, running tasks keep the previous object
+        """
+        if self._plex_network is None or self._due('plex_network', PLEX_NETWORK_INTERVAL):
+            self._last['plex_network'] = time.time()
+            self._plex_network = Plex(self.settings, load=True)
+        return self._plex_network
+
+    def cache(self):
+        """
+        Save the cache statistics and delete data cache files older than the longest
+        cache validity, expired processed_xml entries are otherwise kept for revalidation
+        """
+        if self._due('cache_stats', CACHE_STATS_FLUSH_INTERVAL):
+            cache_stats.flush()
+
+        if self._due('cache_sweep', CACHE_SWEEP_INTERVAL):
+            _ = DATA_CACHE.delete_expired(SECTION_REVISION_MAX_AGE)
+
+    def notifications(self):
+        """
+        :return: True if the notification listeners reported changed content
+        """
+        if not self.settings.server_notifications():
+            if self.notification_listeners:
+                self.notification_listeners.stop()
+                self._last['notifications'] = 0
+            return False
+
+        if self.notification_listeners:
+            return self.notification_listeners.flush()
+
+        if self._due('notifications', NOTIFICATION_INTERVAL):
+            self.notification_listeners.start(self.plex_network().get_server_list())
+        return False
+
+    def widgets(self, content_changed):
+        if not self.settings.background_widgets():
+            if self.widget_thread and not self.widget_thread.ended():
+                self.widget_thread.stop()
+            return
+
+        if self.widget_thread is not None and not self.widget_thread.ended():
+            return
+
+        if (self._due('widgets', WIDGET_REFRESH_INTERVAL) or content_changed or
+                widget_listings_stale()):
+            self._last['widgets'] = time.time()
+            self.widget_thread = WidgetRefreshThread(self.settings, self.plex_network())
+
+    def search_index(self, content_changed):
+        if not self.settings.search_index():
+            if self.search_index_thread and not self.search_index_thread.ended():
+                self.search_index_thread.stop()
+            return
+
+        if self.search_index_thread is not None and not self.search_index_thread.ended():
+            return
+
+        if self._due('search_index', SEARCH_INDEX_INTERVAL) or content_changed:
+            self._last['search_index'] = time.time()
+            self.search_index_thread = SearchIndexThread(self.plex_network())
+
+    def outbox(self):
+        if self._due('outbox', OUTBOX_FLUSH_INTERVAL) and OutboxStore():
+            flush_outbox(self.plex_network())
+
+    def stop(self):
+        self.notification_listeners.stop()
+        for thread in (self.widget_thread, self.search_index_thread):
+            if thread and not thread.ended():
+                thread.stop()
+                thread.join(2)
+        cache_stats.flush()
+
 
 def run():
     settings = AddonSettings()
@@ -34,7 +164,10 @@ def run():
 
     companion_thread = None
 
+    tasks = ServiceTasks(settings, window)
+
     while not monitor.abortRequested():
+        _ = preload()  # reloads translations only when the language has changed
 
         if not companion_thread and settings.use_companion():
             _fresh_settings = AddonSettings()
@@ -45,8 +178,17 @@ def run():
             companion.shutdown(companion_thread)
             companion_thread = None
 
+        tasks.cache()
+        content_changed = tasks.notifications()
+        tasks.widgets(content_changed)
+        tasks.search_index(content_changed)
+        tasks.outbox()
+
         if monitor.waitForAbort(sleep_time):
             break
 
     companion.shutdown(companion_thread)
+    tasks.stop()
     player.cleanup_threads(only_ended=False)  # clean up any/all playback monitoring threads
+    player.timeline_reporter.stop()  # sends the pending stopped reports before ending
+    player.timeline_reporter.join(5)